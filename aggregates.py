@@ -0,0 +1,172 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+from models import db, Subject, Chapter, Quiz, Scores, SubjectScoreStats, UserSubjectScoreStats, Attempt, AttemptBucket
+
+TREND_PERIODS = ('month', 'week')
+REBUILD_CHUNK_ROWS = 5000  # Attempt rows streamed per chunk while rebuilding the buckets
+
+
+def record_score(subject_id, user_id, old_score, new_score):
+    """Apply one Scores upsert (old_score is None for a new row) to the aggregates inside the caller's transaction.
+
+    Returns the user's subject total before (None when it is their first score there) and after.
+    """
+    subject_stats = db.session.get(SubjectScoreStats, subject_id, with_for_update=True)
+    if subject_stats is None:
+        subject_stats = SubjectScoreStats(subject_id=subject_id, attempts=0, total_scored_sum=0, histogram={})
+        db.session.add(subject_stats)
+    user_stats = db.session.get(UserSubjectScoreStats, (user_id, subject_id), with_for_update=True)
+    if user_stats is None:
+        user_stats = UserSubjectScoreStats(user_id=user_id, subject_id=subject_id, attempts=0,
+                                           total_scored_sum=0, histogram={})
+        db.session.add(user_stats)
+        old_total = None
+    else:
+        old_total = user_stats.total_scored_sum
+
+    for stats in (subject_stats, user_stats):
+        histogram = Counter(stats.histogram)
+        if old_score is None:
+            stats.attempts += 1
+        else:
+            stats.total_scored_sum -= old_score
+            histogram[str(old_score)] -= 1
+        stats.total_scored_sum += new_score
+        histogram[str(new_score)] += 1
+        _set_histogram(stats, histogram)
+    return old_total, user_stats.total_scored_sum
+
+
+def rebuild_score_aggregates(subject_id=None):
+    """Recompute the aggregates from Scores, for one subject or for all of them"""
+    for model in (SubjectScoreStats, UserSubjectScoreStats):
+        stmt = db.delete(model)
+        if subject_id is not None:
+            stmt = stmt.filter_by(subject_id=subject_id)
+        db.session.execute(stmt)
+
+    query = db.session.query(
+        Chapter.subject_id,
+        Scores.user_id,
+        Scores.total_scored,
+        db.func.count(Scores.id)
+    ).join(
+        Quiz, Chapter.id == Quiz.chapter_id
+    ).join(
+        Scores, Quiz.id == Scores.quiz_id
+    ).group_by(
+        Chapter.subject_id, Scores.user_id, Scores.total_scored
+    )
+    if subject_id is not None:
+        query = query.filter(Chapter.subject_id == subject_id)
+
+    subject_histograms = defaultdict(Counter)
+    user_histograms = defaultdict(Counter)
+    for row_subject_id, user_id, score, count in query:
+        subject_histograms[row_subject_id][str(score)] += count
+        user_histograms[(user_id, row_subject_id)][str(score)] += count
+
+    if subject_histograms:
+        db.session.execute(db.insert(SubjectScoreStats), [
+            dict(_stats_values(histogram), subject_id=row_subject_id)
+            for row_subject_id, histogram in subject_histograms.items()
+        ])
+        db.session.execute(db.insert(UserSubjectScoreStats), [
+            dict(_stats_values(histogram), user_id=user_id, subject_id=row_subject_id)
+            for (user_id, row_subject_id), histogram in user_histograms.items()
+        ])
+
+
+def bucket_starts(day):
+    """The month and week buckets a day falls in, keyed by period"""
+    return {'month': day.replace(day=1), 'week': day - timedelta(days=day.weekday())}
+
+
+def rebuild_attempt_buckets():
+    """Recount the monthly and weekly attempt buckets from the attempts history"""
+    db.session.execute(db.delete(AttemptBucket))
+    buckets = defaultdict(lambda: [0, 0])
+    rows = db.session.execute(
+        db.select(Attempt.user_id, Attempt.total_scored, Attempt.attempted_at)
+        .execution_options(yield_per=REBUILD_CHUNK_ROWS)
+    )
+    for user_id, score, attempted_at in rows:
+        for period, bucket_start in bucket_starts(attempted_at.date()).items():
+            bucket = buckets[(user_id, period, bucket_start)]
+            bucket[0] += 1
+            bucket[1] += score
+    if buckets:
+        db.session.execute(db.insert(AttemptBucket), [
+            {'user_id': user_id, 'period': period, 'bucket_start': bucket_start,
+             'attempts': attempts, 'total_scored_sum': total}
+            for (user_id, period, bucket_start), (attempts, total) in buckets.items()
+        ])
+
+
+def attempt_trend(user_id, period='month', limit=12):
+    """The user's latest (bucket_start, attempts, total_scored_sum) buckets, oldest first"""
+    rows = db.session.query(
+        AttemptBucket.bucket_start,
+        AttemptBucket.attempts,
+        AttemptBucket.total_scored_sum
+    ).filter(
+        AttemptBucket.user_id == user_id,
+        AttemptBucket.period == period
+    ).order_by(
+        AttemptBucket.bucket_start.desc()
+    ).limit(limit).all()
+    return rows[::-1]
+
+
+def ensure_score_aggregates():
+    """Fill the aggregate tables once for databases that had scores before they existed"""
+    if db.session.query(SubjectScoreStats.subject_id).first() is None and \
+            db.session.query(Scores.id).first() is not None:
+        rebuild_score_aggregates()
+        db.session.commit()
+
+
+def subject_summary():
+    """Per-subject (name, max score, attempts), grouped by name like the original four-table joins"""
+    return db.session.query(
+        Subject.name,
+        db.func.max(SubjectScoreStats.max_score),
+        db.func.sum(SubjectScoreStats.attempts)
+    ).join(
+        SubjectScoreStats, Subject.id == SubjectScoreStats.subject_id
+    ).filter(
+        SubjectScoreStats.attempts > 0
+    ).group_by(
+        Subject.name
+    ).all()
+
+
+def user_subject_attempts(user_id):
+    """Per-subject (name, attempts) for one user"""
+    return db.session.query(
+        Subject.name,
+        db.func.sum(UserSubjectScoreStats.attempts)
+    ).join(
+        UserSubjectScoreStats, Subject.id == UserSubjectScoreStats.subject_id
+    ).filter(
+        UserSubjectScoreStats.user_id == user_id,
+        UserSubjectScoreStats.attempts > 0
+    ).group_by(
+        Subject.name
+    ).all()
+
+
+def _stats_values(histogram):
+    return {
+        'attempts': sum(histogram.values()),
+        'total_scored_sum': sum(int(score) * count for score, count in histogram.items()),
+        'max_score': max(int(score) for score in histogram),
+        'histogram': dict(histogram),
+    }
+
+
+def _set_histogram(stats, histogram):
+    # max_score comes from the histogram so it stays right when a re-attempt lowers the top score
+    histogram = {score: count for score, count in histogram.items() if count > 0}
+    stats.histogram = histogram
+    stats.max_score = max((int(score) for score in histogram), default=None)
@@ -0,0 +1,245 @@
+import gzip
+import hashlib
+import json
+import threading
+from collections import OrderedDict, namedtuple
+from flask import Blueprint, Response, abort, request, url_for
+from flask_login import current_user
+from werkzeug.exceptions import HTTPException
+from models import db, Scores, Quiz
+from catalog import get_catalog, get_quiz_questions
+from question_sets import draw_paper
+from attempts import convert_duration_to_seconds, start_attempt, attempt_state
+from submission_queue import accept_submission
+from leaderboards import get_leaderboards
+from pagination import page_args, keyset_page
+
+try:  # Faster JSON encoding is optional: pip install orjson
+    import orjson
+except ImportError:
+    orjson = None
+
+try:  # Brotli compression is optional: pip install brotli
+    import brotli
+except ImportError:
+    brotli = None
+
+API_CACHE_SIZE = 256  # Encoded catalog and quiz paper payloads kept per process
+API_MAX_AGE = 60  # Seconds browsers and reverse proxies may reuse a public response before revalidating
+COMPRESS_MIN_BYTES = 1024  # Smaller bodies are sent uncompressed
+
+# body is the encoded JSON; encoded caches its compressed forms by content coding
+Payload = namedtuple('Payload', 'body etag last_modified encoded')
+
+api = Blueprint('api', __name__, url_prefix='/api/v1')
+
+_payloads = OrderedDict()  # (kind, id, catalog version) -> Payload
+_lock = threading.Lock()
+
+
+def dumps(data):
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
+
+def make_payload(data, last_modified=None):
+    body = dumps(data)
+    return Payload(body, hashlib.sha256(body).hexdigest()[:32], last_modified, {})
+
+
+def cached_payload(key, build, last_modified=None):
+    """The payload for key, building and encoding it once per catalog version"""
+    with _lock:
+        payload = _payloads.get(key)
+        if payload is not None:
+            _payloads.move_to_end(key)
+            return payload
+    payload = make_payload(build(), last_modified)
+    with _lock:
+        _payloads[key] = payload
+        while len(_payloads) > API_CACHE_SIZE:
+            _payloads.popitem(last=False)
+    return payload
+
+
+def json_response(payload, public=False, status=200):
+    """Send a payload compressed as the client accepts, answering conditional requests with 304.
+
+    Public responses carry no per-user data and may be stored by a reverse proxy for
+    API_MAX_AGE seconds; everything else must be revalidated on every use.
+    """
+    coding = _content_coding(len(payload.body))
+    response = Response(_encode(payload, coding), status=status, mimetype='application/json')
+    if coding:
+        response.content_encoding = coding
+    response.vary.add('Accept-Encoding')
+    response.set_etag(payload.etag, weak=True)  # Weak, so the compressed and plain bodies share it
+    if payload.last_modified is not None:
+        response.last_modified = payload.last_modified
+    if public:
+        response.cache_control.public = True
+        response.cache_control.max_age = API_MAX_AGE
+    else:
+        response.cache_control.private = True
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+
+def _content_coding(size):
+    if size < COMPRESS_MIN_BYTES:
+        return None
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def _encode(payload, coding):
+    if coding is None:
+        return payload.body
+    with _lock:
+        body = payload.encoded.get(coding)
+    if body is None:
+        body = brotli.compress(payload.body, quality=5) if coding == 'br' else gzip.compress(payload.body, 6)
+        with _lock:
+            payload.encoded[coding] = body
+    return body
+
+
+def _student():
+    if not current_user.is_authenticated:
+        abort(401, "Log in first; the API uses the same session cookie as the site.")
+    return current_user.id
+
+
+def catalog_data(catalog):
+    return {
+        'version': catalog.version,
+        'subjects': [{
+            'id': subject.id,
+            'name': subject.name,
+            'description': subject.description,
+            'chapters': [{
+                'id': chapter.id,
+                'name': chapter.name,
+                'description': chapter.description,
+                'quizzes': [{
+                    'id': quiz.id,
+                    'name': quiz.quiz_name,
+                    'no_of_question': quiz.no_of_question,
+                    'duration': quiz.duration,
+                    'randomized': bool(quiz.question_pool),
+                } for quiz in chapter.quizzes],
+            } for chapter in subject.chapters],
+        } for subject in catalog.subjects],
+    }
+
+
+def paper_data(quiz, option_orders=None):
+    """A quiz paper without its answer key; options are [value to submit, text] in display order"""
+    option_orders = option_orders or {}
+    return {
+        'id': quiz.id,
+        'name': quiz.quiz_name,
+        'time_limit': convert_duration_to_seconds(quiz.duration) if quiz.duration else None,
+        'questions': [{
+            'id': question.id,
+            'title': question.question_title,
+            'statement': question.question_statement,
+            'options': [[str(value), getattr(question, f"option{value}")]
+                        for value in option_orders.get(question.id, (1, 2, 3, 4))],
+        } for question in quiz.questions],
+    }
+
+
+@api.errorhandler(HTTPException)
+def api_error(error):
+    return json_response(make_payload({'error': error.description}), status=error.code)
+
+
+@api.route('/catalog')
+def catalog():
+    snapshot = get_catalog()
+    return json_response(
+        cached_payload(('catalog', None, snapshot.version), lambda: catalog_data(snapshot), snapshot.updated_at),
+        public=True
+    )
+
+
+@api.route('/quizzes/<int:quiz_id>/paper')
+def paper(quiz_id):
+    snapshot = get_catalog()
+    quiz = snapshot.quizzes.get(quiz_id)
+    if quiz is None:
+        abort(404)
+    if not quiz.question_pool and not quiz.duration:
+        # The same paper for everybody, so a proxy can serve it
+        return json_response(
+            cached_payload(('paper', quiz_id, snapshot.version),
+                           lambda: paper_data(get_quiz_questions(snapshot, quiz).quiz), snapshot.updated_at),
+            public=True
+        )
+
+    user_id = _student()
+    if quiz.question_pool:
+        data = paper_data(*draw_paper(snapshot, quiz, user_id))
+    else:
+        data = paper_data(get_quiz_questions(snapshot, quiz).quiz)
+    if quiz.duration:
+        start_attempt(quiz_id, user_id, data['time_limit'])  # The clock starts when the paper is fetched
+        data['attempt'] = attempt_state(quiz_id, user_id)
+    return json_response(make_payload(data))
+
+
+@api.route('/quizzes/<int:quiz_id>/submission', methods=['POST'])
+def submit(quiz_id):
+    user_id = _student()
+    snapshot = get_catalog()
+    quiz = snapshot.quizzes.get(quiz_id)
+    if quiz is None:
+        abort(404)
+    answers = (request.get_json(silent=True) or {}).get('answers')
+    if not isinstance(answers, dict):
+        abort(400, 'Send {"answers": {"<question id>": "<option value>"}}.')
+
+    form = {f"answers_{question_id}": str(value) for question_id, value in answers.items()}
+    accepted = accept_submission(snapshot, quiz, user_id, form)
+    if accepted is None:
+        abort(409, "Fetch the paper of a timed quiz before submitting it.")
+    if accepted.result is None:
+        return json_response(make_payload({
+            'status': 'queued',
+            'status_url': url_for('submission_status', quiz_id=quiz_id, submission_id=accepted.submission_id),
+        }), status=202)
+    return json_response(make_payload({
+        'status': 'graded',
+        'score': accepted.result.score,
+        'no_of_question': accepted.quiz.no_of_question,
+    }))
+
+
+@api.route('/scores')
+def scores():
+    """The student's latest score per quiz with their rank, paged with ?after= / ?before= like the site"""
+    user_id = _student()
+    query = db.session.query(
+        Scores.id, Scores.quiz_id, Quiz.quiz_name, Quiz.no_of_question, Scores.total_scored
+    ).join(Quiz, Scores.quiz_id == Quiz.id).filter(Scores.user_id == user_id)
+    page = keyset_page(query, Scores.id, *page_args())
+    boards = get_leaderboards('quiz', [row.quiz_id for row in page.items])
+    rows = []
+    for row in page.items:
+        standing = boards[row.quiz_id].standing(row.total_scored)
+        rows.append({
+            'id': row.id,
+            'quiz_id': row.quiz_id,
+            'quiz_name': row.quiz_name,
+            'no_of_question': row.no_of_question,
+            'score': row.total_scored,
+            'rank': standing.rank,
+            'of': standing.total,
+        })
+    return json_response(make_payload({'scores': rows, 'after': page.next_cursor, 'before': page.prev_cursor}))
@@ -1,34 +1,126 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, session
-from werkzeug.security import generate_password_hash, check_password_hash
-from models import db, User, Subject, Chapter, Quiz, Question, Scores, Answer
-from datetime import datetime, timedelta
+from flask import Flask, render_template, request, redirect, url_for, flash, session, abort, make_response, jsonify, Response, stream_with_context
+from models import db, User, Subject, Chapter, Quiz, Question, Scores, UserSubjectScoreStats
+from catalog import get_catalog, bump_catalog_version
+from aggregates import rebuild_score_aggregates, ensure_score_aggregates, subject_summary, user_subject_attempts, \
+    TREND_PERIODS, attempt_trend, rebuild_attempt_buckets
+from migrations import upgrade_schema
+from search_index import search_enabled, matching_ids, search_catalog
+from pagination import page_args, keyset_page, keyset_slice
+from question_import import import_questions
+from quiz_papers import get_quiz_paper
+from question_sets import QUESTION_POOLS, graded_paper, submitted_answers
+from profiling import init_profiling, render_metrics
+from attempts import convert_duration_to_seconds, start_attempt, attempt_state, autosave, start_autosave_flusher
+from submission_queue import accept_submission, drain_submissions, submission_state, start_submission_writer
+from passwords import PasswordHasher, PasswordHashBusy, LoginLimiter
+from user_cache import UserCache, USER_CACHE_SIZE, USER_CACHE_TTL
+from item_analysis import item_analysis
+from leaderboards import LEADERBOARD_KINDS, get_leaderboard, get_leaderboards, leaderboard_rows
+from deletes import count_answers, delete_node, start_background_delete
+from api import api
+from warmup import warm_up
+from exports import EXPORTS, EXPORT_FORMATS, parquet_available, export_statement, iter_csv, iter_parquet
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from collections import defaultdict
 import matplotlib
 matplotlib.use('Agg')  # Required for server-side plotting
-import matplotlib.pyplot as plt
+from charts import CHART_RENDERERS, chart_digest, submit_chart, render_chart
+import os
 import io
-import base64
-from matplotlib.patches import Circle
+import csv
+import click
+from sqlalchemy import event
 
 
 
 app = Flask(__name__)
 
-# Database Configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///vivek.sqlite'
-app.config['SECRET_KEY'] = 'your_secret_key'
+# Database Configuration (every setting can be overridden from the environment)
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///vivek.sqlite')
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your_secret_key')
+if ':memory:' not in app.config['SQLALCHEMY_DATABASE_URI']:
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', 10)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 20)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 30)),
+    }
+# Applied to every new SQLite connection
+app.config['SQLITE_PRAGMAS'] = {
+    'journal_mode': os.environ.get('SQLITE_JOURNAL_MODE', 'WAL'),  # Readers don't block the writer
+    'synchronous': os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL'),  # Safe with WAL, no fsync per commit
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 5000)),  # Wait for the write lock instead of "database is locked"
+    'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+    'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', -64 * 1024)),  # Negative means KiB
+    'foreign_keys': 'ON',  # Deletes rely on ON DELETE CASCADE, which SQLite only enforces with this on
+}
+app.config['PAGE_SIZE'] = int(os.environ.get('PAGE_SIZE', 20))  # Rows per page on paginated listings
+app.config['MAX_PAGE_SIZE'] = int(os.environ.get('MAX_PAGE_SIZE', 100))
+# Password hashing, e.g. "pbkdf2:sha256:600000" or "scrypt:32768:8:1"; older hashes are upgraded on the next login
+app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'pbkdf2:sha256')
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', 4))  # Hashes computed at once
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 64))  # Logins waiting before "busy"
+# Seconds over which failed logins are counted; the counts are shared by every worker process
+app.config['LOGIN_WINDOW'] = int(os.environ.get('LOGIN_WINDOW', 300))
+app.config['LOGIN_MAX_FAILURES'] = int(os.environ.get('LOGIN_MAX_FAILURES', 5))  # Per username and client address
+app.config['LOGIN_MAX_FAILURES_PER_IP'] = int(os.environ.get('LOGIN_MAX_FAILURES_PER_IP', 50))
+# Reverse proxies in front of the app whose X-Forwarded-For/-Proto/-Host headers are trusted; 0 trusts none
+app.config['TRUSTED_PROXIES'] = int(os.environ.get('TRUSTED_PROXIES', 0))
+# Opt-in request timing, SQL statement counting and N+1 detection, exposed on /metrics
+app.config['PROFILING'] = os.environ.get('PROFILING', '').lower() in ('1', 'true', 'yes')
+app.config['N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('N_PLUS_ONE_THRESHOLD', 10))  # Same statement more often than this in one request
+app.config['SLOW_REQUEST_MS'] = int(os.environ.get('SLOW_REQUEST_MS', 0))  # Dump a cProfile of slower requests; 0 disables
+app.config['PROFILE_DIR'] = os.environ.get('PROFILE_DIR', os.path.join(app.instance_path, 'profiles'))
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # If set, /metrics requires "Authorization: Bearer <token>"
+# Queue quiz submissions and grade them in a background writer instead of inside the request
+app.config['SUBMISSION_QUEUE'] = os.environ.get('SUBMISSION_QUEUE', '').lower() in ('1', 'true', 'yes')
+# Deleting a subject, chapter or quiz with more answers than this purges them in batches in the background; 0 never does
+app.config['BACKGROUND_DELETE_ANSWERS'] = int(os.environ.get('BACKGROUND_DELETE_ANSWERS', 100000))
 db.init_app(app)
+if app.config['TRUSTED_PROXIES']:
+    # Behind a proxy every request comes from the proxy's address; take the client's from its headers
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['TRUSTED_PROXIES'],
+                            x_proto=app.config['TRUSTED_PROXIES'], x_host=app.config['TRUSTED_PROXIES'])
+
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    cursor = dbapi_connection.cursor()
+    for name, value in app.config['SQLITE_PRAGMAS'].items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+
+with app.app_context():
+    if db.engine.dialect.name == 'sqlite':
+        event.listen(db.engine, 'connect', set_sqlite_pragmas)
+    if app.config['PROFILING']:
+        init_profiling(app, db.engine)
+
+app.register_blueprint(api)  # JSON API for the quiz client under /api/v1
 
 # Initialize Flask-Login
 login_manager = LoginManager()
 login_manager.init_app(app)  # Attach to the Flask app
 login_manager.login_view = 'user_login'  # Redirect unauthenticated users to login page
 
+password_hasher = PasswordHasher(app.config['PASSWORD_HASH_WORKERS'], app.config['PASSWORD_HASH_QUEUE'])
+login_limiter = LoginLimiter(
+    app.config['LOGIN_WINDOW'],
+    app.config['LOGIN_MAX_FAILURES'],
+    app.config['LOGIN_MAX_FAILURES_PER_IP']
+)
+
+os.makedirs(app.instance_path, exist_ok=True)
+user_cache = UserCache(
+    maxsize=int(os.environ.get('USER_CACHE_SIZE', USER_CACHE_SIZE)),
+    ttl=int(os.environ.get('USER_CACHE_TTL', USER_CACHE_TTL)),
+    stamp_path=os.path.join(app.instance_path, 'user_cache.stamp')
+)
+
 # User loader function (required for Flask-Login)
 @login_manager.user_loader
 def load_user(user_id):
-    return User.query.get(int(user_id))  # Load user from database
+    return user_cache.get(int(user_id))  # Load user from cache, falling back to the database
 
 @app.route("/")
 def home():
@@ -43,7 +135,11 @@ def register():
     if request.method == 'POST':
         username = request.form['username']
         email = request.form['email']
-        password = generate_password_hash(request.form['password'], method='pbkdf2:sha256')
+        try:
+            password = password_hasher.hash(request.form['password'])
+        except PasswordHashBusy:
+            flash('The server is busy. Please try again in a moment.')
+            return render_template("register.html"), 503
         full_name = request.form['full_name']
         qualification = request.form['qualification']
 
@@ -61,8 +157,12 @@ def user_login():
         username = request.form['username']
         password = request.form['password']
 
-        user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password) and user.role == 1:
+        user, refused = authenticate(username, password, role=1)
+        if refused:
+            message, status = refused
+            flash(message)
+            return render_template("user_login.html", role='User'), status
+        if user:
             if user.blocked:
                 flash("Your account is blocked. Please contact the administrator.", "danger")
                 return redirect(url_for('user_login'))
@@ -82,8 +182,12 @@ def admin_login():
         username = request.form['username']
         password = request.form['password']
 
-        user = User.query.filter_by(username=username).first()
-        if user and check_password_hash(user.password, password) and user.role == 0:
+        user, refused = authenticate(username, password, role=0)
+        if refused:
+            message, status = refused
+            flash(message)
+            return render_template('admin_login.html', role="Admin"), status
+        if user:
             login_user(user)  # Flask-Login: Log in admin
             flash('Login successful!')
             return redirect(url_for('admin_dashboard', name=username))
@@ -93,6 +197,29 @@ def admin_login():
     
     return render_template('admin_login.html', role="Admin")
 
+def authenticate(username, password, role):
+    """Return (user, None) for valid credentials, (None, None) for invalid ones, or (None, (message, status)) when refused
+
+    Addresses with too many recent failures, and usernames with too many from this address, are refused
+    before any password is hashed; failures elsewhere never lock the account itself.
+    """
+    keys = login_limiter.keys(username, request.remote_addr)
+    if login_limiter.is_blocked(keys):
+        return None, ('Too many failed login attempts. Please try again later.', 429)
+
+    user = User.query.filter_by(username=username).first()
+    try:
+        valid = user is not None and user.role == role and password_hasher.verify(user, password)
+    except PasswordHashBusy:
+        return None, ('The server is busy. Please try again in a moment.', 503)
+    if not valid:
+        login_limiter.record_failure(keys)
+        db.session.commit()
+        return None, None
+    login_limiter.reset(keys[0])
+    db.session.commit()  # Saves a re-hashed password
+    return user, None
+
 # Logout Route (New)
 @app.route("/logout")
 @login_required
@@ -110,21 +237,17 @@ def logout():
 @app.route("/user_dashboard/<string:name>")
 def user_dashboard(name):
     # chapters = Subject.query.get_or_404(subject_id)
-    subjects=Subject.query.all()
-    chapters=Chapter.query.all()
-    quizzes=Quiz.query.all()
-    questions=Question.query.all()
-    return render_template("user_dashboard.html",subjects=subjects,chapters=chapters,quizzes=quizzes,questions=questions,name=name)
+    subjects=get_catalog().subjects
+    return render_template("user_dashboard.html",subjects=subjects,name=name)
 
 
 
 @app.route("/admin_dashboard/<string:name>")
 def admin_dashboard(name):
-    subjects=Subject.query.all()
-    chapters=Chapter.query.all()
-    users = User.query.all()
+    subjects=get_catalog().subjects
+    page = keyset_page(User.query, User.id, *page_args())
     # chapters = Subject.query.get_or_404(subject_id)
-    return render_template("admin_dashboard.html",users=users,subjects=subjects,chapters=chapters,name=name)
+    return render_template("admin_dashboard.html",users=page.items,page=page,subjects=subjects,name=name)
  
 
 @app.route("/new_subject/<string:name>",methods=["GET","POST"])
@@ -137,6 +260,7 @@ def new_subject(name):
         new_subjs = Subject(name=name,description=description)
         
         db.session.add(new_subjs)
+        bump_catalog_version()
         db.session.commit()
         return redirect(url_for('admin_dashboard',name=name))
     return render_template("new_subject.html",name=name)
@@ -152,6 +276,7 @@ def new_chapter(subject_id,name):
         new_chapter = Chapter(name=name,no_of_question=no_of_question,description=description,subject_id=subject_id)
        
         db.session.add(new_chapter)
+        bump_catalog_version()
         db.session.commit()
         return redirect(url_for('admin_dashboard',name=name))
     return render_template("new_chapter.html",subject_id=subject_id,name=name)
@@ -165,15 +290,14 @@ def edit_subject(id,name):
 
         s.name=request.form["name"]
         s.description=request.form["description"]
+        bump_catalog_version()
         db.session.commit()
         return redirect(url_for("admin_dashboard",name=name))
     return render_template("edit_subject.html",subject=s,name=name)
 
 @app.route("/delete_subject/<int:id>/<string:name>" , methods=["GET","POST"])
 def delete_subject(id,name):
-    s=get_subject(id)
-    db.session.delete(s)
-    db.session.commit()
+    delete_catalog_node('subject', id)
     return redirect(url_for("admin_dashboard",name=name))
 
 @app.route("/edit_chapter/<int:id>/<string:name>" , methods=["GET","POST"])
@@ -186,15 +310,14 @@ def edit_chapter(id,name):
         c.name=request.form["chapter_name"]
         c.no_of_question=request.form["no_of_question"]
         c.description=request.form["description"]
+        bump_catalog_version()
         db.session.commit()
         return redirect(url_for("admin_dashboard",name=name))
     return render_template("edit_chapter.html",chapter=c,name=name)
 
 @app.route("/delete_chapter/<int:id>/<string:name>" , methods=["GET","POST"])
 def delete_chapter(id,name):
-    c=get_chapter(id)
-    db.session.delete(c)
-    db.session.commit()
+    delete_catalog_node('chapter', id)
     return redirect(url_for("admin_dashboard",name=name))
  
 @app.route("/edit_question/<int:id>", methods=["GET","POST"])
@@ -208,6 +331,7 @@ def edit_question(id):
         q.option3=request.form["question_3"]
         q.option4=request.form["question_4"]
         q.correct_option=request.form["correct_question"]
+        bump_catalog_version()
         db.session.commit()
         return redirect(url_for("quiz_manager"))
     return render_template("edit_question.html",question=q)
@@ -216,6 +340,7 @@ def edit_question(id):
 def delete_question(id):
     q=get_question(id)
     db.session.delete(q)
+    bump_catalog_version()
     db.session.commit()
     return redirect(url_for("quiz_manager"))
 
@@ -225,6 +350,9 @@ def edit_quiz(id):
     if request.method=="POST":
        quiz.quiz_name=request.form["quiz_name"]
        quiz.no_of_question = int(request.form["no_of_question"]) 
+       quiz.question_pool = question_pool_arg()
+       quiz.duration = duration_arg()
+       bump_catalog_version()
        db.session.commit()
        return redirect(url_for("quiz_manager"))
       # ✅ Convert date from string to `datetime.date`
@@ -243,15 +371,23 @@ def edit_quiz(id):
     # if isinstance(quiz.duration, str):  
     #     hours, minutes = map(int, quiz.duration.split(":"))
     #     quiz.duration = timedelta(hours=hours, minutes=minutes)
-    return render_template("edit_quiz.html",quiz=quiz)
+    return render_template("edit_quiz.html",quiz=quiz,question_pools=QUESTION_POOLS)
 
 @app.route("/delete_quiz/<int:id>")
 def delete_quiz(id):
-    quiz=get_quiz(id)
-    db.session.delete(quiz)
-    db.session.commit()
+    delete_catalog_node('quiz', id)
     return redirect(url_for("quiz_manager"))
 
+def delete_catalog_node(kind, node_id):
+    """Delete a subject, chapter or quiz and everything under it; ones with many answers are purged in the background"""
+    limit = app.config['BACKGROUND_DELETE_ANSWERS']
+    if limit and count_answers(kind, node_id, limit + 1) > limit:
+        if start_background_delete(app, kind, node_id):
+            flash(f"The {kind} has many answers and is being deleted in the background.")
+        return
+    delete_node(kind, node_id)
+    db.session.commit()
+
 # @app.route("/new_question/<int: subject_id>/<int:chapter_id>/<int:quiz_id>",methods=["GET","POST"])
 @app.route("/new_question/<int:subject_id>/<int:chapter_id>/<int:quiz_id>", methods=["GET", "POST"])
 def new_question(subject_id,chapter_id,quiz_id):
@@ -265,12 +401,38 @@ def new_question(subject_id,chapter_id,quiz_id):
         correct_question=request.form["correct_question"]
         new_question=Question(subject_id=subject_id,chapter_id=chapter_id,quiz_id=quiz_id,question_title=question_title,question_statement=question_statement,option1=question_1,option2=question_2,option3=question_3,option4=question_4,correct_option=correct_question)
         db.session.add(new_question)
+        bump_catalog_version()
         db.session.commit()
         return redirect(url_for("quiz_manager"))
     return render_template("new_question.html",subject_id=subject_id,chapter_id=chapter_id,quiz_id=quiz_id)
 
  
 
+MAX_REPORTED_IMPORT_ERRORS = 1000  # Rejected rows listed on the import page
+
+@app.route("/import_questions", methods=["GET", "POST"])
+@login_required
+def import_questions_view():
+    if current_user.role != 0:
+        abort(403)
+    if request.method == "POST":
+        upload = request.files.get("file")
+        if not upload or not upload.filename:
+            flash("Please choose a CSV or JSONL file.", "danger")
+            return redirect(url_for("import_questions_view"))
+        fmt = "jsonl" if upload.filename.lower().endswith((".jsonl", ".json")) else "csv"
+        dry_run = bool(request.form.get("dry_run"))
+        errors = []
+
+        def on_error(line_no, message):
+            if len(errors) < MAX_REPORTED_IMPORT_ERRORS:
+                errors.append((line_no, message))
+
+        lines = io.TextIOWrapper(upload.stream, encoding="utf-8-sig", newline="")
+        result = import_questions(lines, fmt, on_error, dry_run=dry_run)
+        return render_template("import_questions.html", result=result, errors=errors, dry_run=dry_run)
+    return render_template("import_questions.html")
+
 @app.route("/new_quiz/<int:chapter_id>" , methods=["GET","POST"])
 def new_quiz(chapter_id):
     if request.method=="POST":
@@ -290,75 +452,110 @@ def new_quiz(chapter_id):
  
 
        remarks=request.form["remarks"]
-       new_q=Quiz(quiz_name=quiz_name,chapter_id=chapter_id,no_of_question=no_of_question,remarks=remarks)
+       new_q=Quiz(quiz_name=quiz_name,chapter_id=chapter_id,no_of_question=no_of_question,remarks=remarks,
+                  question_pool=question_pool_arg(),duration=duration_arg())
        db.session.add(new_q)
+       bump_catalog_version()
        db.session.commit()
        return redirect(url_for("quiz_manager"))
 
-    return render_template("new_quiz.html",chapter_id=chapter_id, quiz=None)
+    return render_template("new_quiz.html",chapter_id=chapter_id, quiz=None, question_pools=QUESTION_POOLS)
+
+def duration_arg():
+    duration = request.form.get("duration") or None  # HH:MM from the time input; empty means untimed
+    if duration is not None:
+        try:
+            if not convert_duration_to_seconds(duration):
+                duration = None
+        except ValueError:
+            abort(400)
+    return duration
+
+def question_pool_arg():
+    question_pool = request.form.get("question_pool") or None
+    if question_pool is not None and question_pool not in QUESTION_POOLS:
+        abort(400)
+    return question_pool
 
 @app.route('/quiz/<int:quiz_id>', methods=['GET', 'POST'])
 def quiz(quiz_id):
-    quiz = Quiz.query.get(quiz_id)
     # Assuming duration is stored in minutes, multiply by 60 to convert to seconds
     # duration_in_seconds = quiz.duration * 60
     
-    return render_template('quiz_questions.html', quiz=quiz, questions=quiz.questions)
+    return quiz_paper_response(quiz_id)
 
 @app.route("/quiz_manager",methods=["GET"])
 def quiz_manager():
-    subjects=Subject.query.all()
-    chapters=Chapter.query.all()
-    quizzes = Quiz.query.all()
-    questions=Question.query.all()
-    return render_template("quiz_manager.html",subjects=subjects,chapters=chapters,quizzes=quizzes,questions=questions)
+    catalog=get_catalog()
+    after, before, per_page = page_args()
+    page = keyset_slice(catalog.chapter_list, catalog.chapter_ids, after, before, per_page)
+
+    # Only the questions of the quizzes on this page are loaded
+    quiz_ids = [quiz.id for chapter in page.items for quiz in chapter.quizzes]
+    questions = defaultdict(list)
+    if quiz_ids:
+        for question in db.session.query(Question.id, Question.quiz_id, Question.question_title).filter(
+            Question.quiz_id.in_(quiz_ids)
+        ).order_by(Question.id):
+            questions[question.quiz_id].append(question)
+    analysis = item_analysis(quiz_ids)  # Quizzes not analysed yet are computed in the background
+    item_stats = {item.question_id: item for items in analysis.values() for item in items}
+    return render_template("quiz_manager.html",chapters=page.items,page=page,questions=questions,
+                           subjects=catalog.subjects_by_id,item_stats=item_stats,
+                           pending_analysis=set(quiz_ids) - analysis.keys())
 
 @app.route("/view_quiz/<string:subject_name>/<string:chapter_name>/<int:id>")
 def view_quiz(subject_name,chapter_name,id):
-    quiz_id=get_quiz_id(id)
+    catalog=get_catalog()
+    quiz_id=catalog.quizzes.get(id)
 
-    subject_name=get_subject_name(subject_name)
-    chapter_name=get_chapter_name(chapter_name)
+    subject_name=catalog.subjects_by_name.get(subject_name)
+    chapter_name=catalog.chapters_by_name.get(chapter_name)
    
     return render_template("view_quiz.html",quiz_id=quiz_id,subject_name=subject_name,chapter_name=chapter_name)
 
 @app.route('/start_quiz/<int:quiz_id>', methods=['GET', 'POST'])
 def start_quiz(quiz_id): 
-    quiz=get_quiz_id(quiz_id)
-    
-    return render_template("quiz_questions.html",quiz=quiz)
+    return quiz_paper_response(quiz_id)
+
+def quiz_paper_response(quiz_id):
+    paper = get_quiz_paper(quiz_id, current_user.id if current_user.is_authenticated else None)
+    if paper is None:
+        return render_template("quiz_questions.html",quiz=None,option_orders={})
+    if paper.time_limit:
+        if not current_user.is_authenticated:
+            return login_manager.unauthorized()
+        start_attempt(quiz_id, current_user.id, paper.time_limit)  # The clock starts when the paper is opened
+
+    if paper.etag in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(paper.html)
+    response.set_etag(paper.etag)
+    # Browsers revalidate every time, so an edited quiz is never served stale
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
 
 @app.route('/post_start_quiz/<int:quiz_id>', methods=['POST'])
 @login_required  # Ensure user is logged in
 def post_start_quiz(quiz_id):
-    quiz = Quiz.query.get_or_404(quiz_id)
+    catalog = get_catalog()
+    quiz = catalog.quizzes.get(quiz_id)
+    if quiz is None:
+        abort(404)
     user = current_user  # Assuming Flask-Login is used
 
     if request.method == 'POST':
-        answers = request.form
-        score = 0
-        list=[]
-        for question in quiz.questions:
-            user_answer = answers.get(f"answers_{question.id}")  # Correct way to fetch answers
-        
-            list.append(user_answer)
-            if user_answer and str(user_answer) == str(question.correct_option):
-                score += 1  # Increment score if the answer is correct
-
-            # Save answer to Answer table (if needed)
-            new_answer = Answer(question_id=1, user_id=2, answer_text="Some answer", selected_answer=user_answer)  # ✅ Now works
-            db.session.add(new_answer)
-
-        # Check if a score entry already exists for this user and quiz
-        existing_score = Scores.query.filter_by(quiz_id=quiz.id, user_id=user.id).first()
-
-        if existing_score:
-            existing_score.total_scored = score  # Update the existing score
-        else:
-            new_score = Scores(quiz_id=quiz.id, user_id=user.id, total_scored=score)
-            db.session.add(new_score)
-
-        db.session.commit()
+        accepted = accept_submission(catalog, quiz, user.id, request.form)
+        if accepted is None:
+            flash("Start the quiz before submitting it.")
+            return redirect(url_for('start_quiz', quiz_id=quiz.id))
+        quiz = accepted.quiz
+        if accepted.result is None:
+            return render_template("submission_queued.html",quiz=quiz,submission_id=accepted.submission_id)
+        score = accepted.result.score
+        list = accepted.result.selected
 
         return render_template("submit.html",quiz=quiz,list=list,score=score)
         # given_option = request.form["answers"]  # Get the selected answer
@@ -377,19 +574,15 @@ def post_start_quiz(quiz_id):
 @app.route("/again_user_dashboard>")
 def again_user_dashboard():
     # chapters = Subject.query.get_or_404(subject_id)
-    subjects=Subject.query.all()
-    chapters=Chapter.query.all()
-    quizzes=Quiz.query.all()
-    questions=Question.query.all()
-    return render_template("user_dashboard.html",subjects=subjects,chapters=chapters,quizzes=quizzes,questions=questions)
+    subjects=get_catalog().subjects
+    return render_template("user_dashboard.html",subjects=subjects)
 
 @app.route("/again_admin_dashboard")
 def again_admin_dashboard():
-    subjects=Subject.query.all()
-    chapters=Chapter.query.all()
-    users = User.query.all()
+    subjects=get_catalog().subjects
+    page = keyset_page(User.query, User.id, *page_args())
     # chapters = Subject.query.get_or_404(subject_id)
-    return render_template("admin_dashboard.html",users=users,subjects=subjects,chapters=chapters)
+    return render_template("admin_dashboard.html",users=page.items,page=page,subjects=subjects)
  
 
 
@@ -401,11 +594,52 @@ def quiz_summary(quiz_id):
 
     return render_template("quiz_summary.html", quiz=quiz)
 
+@app.route("/quiz_attempt/<int:quiz_id>", methods=["GET", "POST"])
+@login_required
+def quiz_attempt(quiz_id):
+    if request.method == "GET":
+        state = attempt_state(quiz_id, current_user.id)
+        if state is None:
+            abort(404)
+        return jsonify(state)
+
+    catalog = get_catalog()
+    quiz = catalog.quizzes.get(quiz_id)
+    if quiz is None:
+        abort(404)
+    _, answer_key = graded_paper(catalog, quiz, current_user.id)
+    if not autosave(quiz_id, current_user.id, submitted_answers(answer_key, request.form)):
+        return jsonify(status="closed"), 409
+    start_autosave_flusher(app)
+    return '', 204
+
+@app.route("/metrics")
+def metrics():
+    if not app.config['PROFILING']:
+        abort(404)
+    token = app.config['METRICS_TOKEN']
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        abort(401)
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+@app.route("/submission_status/<int:quiz_id>/<int:submission_id>")
+@login_required
+def submission_status(quiz_id, submission_id):
+    state = submission_state(submission_id, current_user.id)
+    if state is not None:
+        return jsonify(status=state)
+
+    score = Scores.query.filter_by(quiz_id=quiz_id, user_id=current_user.id).first()
+    if score is None:
+        return jsonify(status="missing")
+    return jsonify(status="graded", score=score.total_scored, no_of_question=score.quiz.no_of_question)
+
 @app.route("/block_user/<int:user_id>/<string:admin_name>", methods=["POST"])
 def block_user(user_id, admin_name):
     user = User.query.get_or_404(user_id)
     user.blocked = True
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash(f"User '{user.username}' has been blocked.", "success")
     return redirect(url_for('admin_dashboard', name=admin_name))
 
@@ -414,52 +648,47 @@ def unblock_user(user_id, admin_name):
     user = User.query.get_or_404(user_id)
     user.blocked = False
     db.session.commit()
+    user_cache.invalidate(user.id)
     flash(f"User '{user.username}' has been unblocked.", "success")
     return redirect(url_for('admin_dashboard', name=admin_name))
 
 
+@app.route("/user_cache_stats")
+@login_required
+def user_cache_stats():
+    if current_user.role != 0:
+        abort(403)
+    return jsonify(user_cache.stats())
+
+
 @app.route("/summary_chart/<string:username>")
 @login_required
 def summary_chart(username):
     # Get subject-wise quiz counts
-    subject_quiz_counts = db.session.query(
-        Subject.name,
-        db.func.count(Quiz.id).label('quiz_count')
-    ).join(
-        Chapter, Subject.id == Chapter.subject_id
-    ).join(
-        Quiz, Chapter.id == Quiz.chapter_id
-    ).join(
-        Scores, Quiz.id == Scores.quiz_id
-    ).filter(
-        Scores.user_id == current_user.id
-    ).group_by(
-        Subject.name
-    ).all()
+    subject_quiz_counts = user_subject_attempts(current_user.id)
 
     # Convert to format needed for chart
     subjects = [sq[0] for sq in subject_quiz_counts]
     quiz_counts = [sq[1] for sq in subject_quiz_counts]
 
-    # Get month-wise attempted quiz counts
-    month_quiz_counts = db.session.query(
-        db.func.count(Scores.id).label('attempt_count')
-    ).filter(
-        Scores.user_id == current_user.id
-    ).group_by(
-        # If you have the time_stamp_of_attempt field uncommented, use:
-        # db.func.strftime('%m', Scores.time_stamp_of_attempt)
-        Scores.id  # Temporary grouping, replace with actual month when timestamp is added
-    ).all()
+    # Get month-wise (or week-wise) attempted quiz counts from the pre-bucketed history
+    period = request.args.get('period', 'month')
+    if period not in TREND_PERIODS:
+        abort(404)
+    trend = attempt_trend(current_user.id, period)
 
     # Convert to format needed for chart
-    month_counts = [count[0] for count in month_quiz_counts]
+    label_format = '%b %Y' if period == 'month' else 'Week of %d %b %Y'
+    month_labels = [bucket.bucket_start.strftime(label_format) for bucket in trend]
+    month_counts = [bucket.attempts for bucket in trend]
 
     return render_template(
         "summary_chart.html",
         username=username,
         subjects=subjects,
         quiz_counts=quiz_counts,
+        period=period,
+        month_labels=month_labels,
         month_counts=month_counts
     )
 #summary for admin
@@ -471,87 +700,43 @@ def admin_summary(username):
         flash("Access denied. Admin privileges required.")
         return redirect(url_for('user_dashboard', name=username))
 
-    # Get subject-wise top scores
-    subject_scores = db.session.query(
-        Subject.name,
-        db.func.max(Scores.total_scored).label('top_score')
-    ).join(
-        Chapter, Subject.id == Chapter.subject_id
-    ).join(
-        Quiz, Chapter.id == Quiz.chapter_id
-    ).join(
-        Scores, Quiz.id == Scores.quiz_id
-    ).group_by(
-        Subject.name
-    ).all()
-
-    # Get subject-wise attempt counts
-    subject_attempts = db.session.query(
-        Subject.name,
-        db.func.count(Scores.id).label('attempt_count')
-    ).join(
-        Chapter, Subject.id == Chapter.subject_id
-    ).join(
-        Quiz, Chapter.id == Quiz.chapter_id
-    ).join(
-        Scores, Quiz.id == Scores.quiz_id
-    ).group_by(
-        Subject.name
-    ).all()
-
-    # Create bar chart
-    plt.figure(figsize=(10, 5))
-    subjects = [s[0] for s in subject_scores]
-    scores = [s[1] for s in subject_scores]
-    colors = ['skyblue', 'red', 'green', 'yellow', 'pink']
-    plt.bar(subjects, scores, color=colors)
-    plt.title('Subject-wise Top Scores')
-    plt.xlabel('Subjects')
-    plt.ylabel('Scores')
-    
-    # Save bar chart to string buffer
-    buf = io.BytesIO()
-    plt.savefig(buf, format='png', bbox_inches='tight')
-    buf.seek(0)
-    bar_chart = base64.b64encode(buf.getvalue()).decode('utf-8')
-    plt.close()
-
-    # Create circular chart for attempts
-    plt.figure(figsize=(8, 8))
-    circle1 = plt.Circle((0.5, 0.5), 0.4, color='yellow', fill=False)
-    circle2 = plt.Circle((0.5, 0.5), 0.3, color='blue', fill=False)
-    circle3 = plt.Circle((0.5, 0.5), 0.2, color='red', fill=False)
-    
-    fig, ax = plt.subplots()
-    ax.set_xlim(0, 1)
-    ax.set_ylim(0, 1)
-    ax.add_artist(circle1)
-    ax.add_artist(circle2)
-    ax.add_artist(circle3)
-    ax.axis('off')
-    plt.title('Subject-wise User Attempts')
-    
-    # Save circular chart to string buffer
-    buf2 = io.BytesIO()
-    plt.savefig(buf2, format='png', bbox_inches='tight')
-    buf2.seek(0)
-    circle_chart = base64.b64encode(buf2.getvalue()).decode('utf-8')
-    plt.close()
+    data = admin_summary_data()
+    digests = {kind: chart_digest(kind, data[kind]) for kind in CHART_RENDERERS}
+    for kind, digest in digests.items():
+        submit_chart(kind, data[kind], digest)  # Start rendering before the browser asks for the images
 
     return render_template(
         'admin_summary_chart.html',
         username=username,
-        bar_chart=bar_chart,
-        circle_chart=circle_chart
+        bar_chart=digests['bar'],
+        circle_chart=digests['circle']
     )
 
+@app.route("/admin_summary_chart/<string:kind>.png")
+@login_required
+def admin_summary_chart(kind):
+    if current_user.role != 0 or kind not in CHART_RENDERERS:
+        abort(404)
+
+    data = admin_summary_data()[kind]
+    digest = chart_digest(kind, data)
+    if digest in request.if_none_match:
+        response = make_response('', 304)
+    else:
+        response = make_response(render_chart(kind, data, digest))
+        response.mimetype = 'image/png'
+    response.set_etag(digest)
+    # The page links each image with ?v=<digest>, so a cached copy is only reused while the data is unchanged
+    response.cache_control.private = True
+    response.cache_control.max_age = 3600
+    return response
+
 @app.route("/search/<name>",methods=["GET","POST"])
 def search(name):
     if request.method=="POST":
        search_txt=request.form.get("search_txt")
        by_subject=search_by_subject(search_txt)
        b_chapter=search_by_chapter(search_txt)
-       print(b_chapter)
        if by_subject:
            return render_template("admin_dashboard.html",name=name,subjects=by_subject)
        elif b_chapter:
@@ -559,12 +744,30 @@ def search(name):
 
     return redirect(url_for("admin_dashboard",name=name))
 
+@app.route("/search_catalog")
+@login_required
+def search_catalog_api():
+    kinds = request.args.getlist("kind") or None
+    page = search_catalog(
+        request.args.get("q", ""),
+        kinds=kinds,
+        page=request.args.get("page", 1, type=int),
+        per_page=min(request.args.get("per_page", 20, type=int), 100)
+    )
+    return jsonify(
+        results=[hit._asdict() for hit in page.hits],
+        page=page.page,
+        per_page=page.per_page,
+        has_next=page.has_next
+    )
+
 @app.route("/scores_dashboard/<string:username>")
 @login_required
 def scores_dashboard(username):
     # Get the current user's scores
     user_scores = db.session.query(
         Scores.id,
+        Scores.quiz_id,
         Quiz.quiz_name,
         Quiz.no_of_question,
         Scores.total_scored
@@ -572,9 +775,11 @@ def scores_dashboard(username):
         Quiz, Scores.quiz_id == Quiz.id
     ).filter(
         Scores.user_id == current_user.id
-    ).all()
+    )
+    page = keyset_page(user_scores, Scores.id, *page_args())
     
-    return render_template("scores_dashboard.html", scores=user_scores, username=username)
+    return render_template("scores_dashboard.html", scores=page.items, page=page, username=username,
+                           standings=score_standings(page.items))
 
 @app.route("/search_scores", methods=["POST"])
 @login_required
@@ -584,17 +789,85 @@ def search_scores():
     # Search in quiz names and scores
     user_scores = db.session.query(
         Scores.id,
+        Scores.quiz_id,
         Quiz.quiz_name,
         Quiz.no_of_question,
         Scores.total_scored
     ).join(
         Quiz, Scores.quiz_id == Quiz.id
     ).filter(
-        Scores.user_id == current_user.id,
-        Quiz.quiz_name.ilike(f"%{search_query}%")
-    ).all()
+        Scores.user_id == current_user.id
+    )
+    if search_query.strip():
+        if search_enabled():
+            user_scores = user_scores.filter(Quiz.id.in_(matching_ids('quizzes', search_query)))
+        else:
+            user_scores = user_scores.filter(Quiz.quiz_name.ilike(f"%{search_query}%"))
+    user_scores = user_scores.all()
     
-    return render_template("scores_dashboard.html", scores=user_scores, username=current_user.username)
+    return render_template("scores_dashboard.html", scores=user_scores, username=current_user.username,
+                           standings=score_standings(user_scores))
+
+def score_standings(scores):
+    """The user's rank on each quiz of their score rows, keyed by quiz id"""
+    boards = get_leaderboards('quiz', [score.quiz_id for score in scores])
+    return {score.quiz_id: boards[score.quiz_id].standing(score.total_scored) for score in scores}
+
+@app.route("/leaderboard/<string:kind>/<int:board_id>")
+@login_required
+def leaderboard(kind, board_id):
+    catalog = get_catalog()
+    if kind not in LEADERBOARD_KINDS:
+        abort(404)
+    if kind == 'quiz':
+        node = catalog.quizzes.get(board_id)
+        title = node and node.quiz_name
+        own_score = db.session.execute(
+            db.select(Scores.total_scored).filter_by(quiz_id=board_id, user_id=current_user.id)
+        ).scalar()
+    else:
+        node = catalog.subjects_by_id.get(board_id)
+        title = node and node.name
+        own_score = db.session.execute(
+            db.select(UserSubjectScoreStats.total_scored_sum).filter_by(subject_id=board_id, user_id=current_user.id)
+        ).scalar()
+    if node is None:
+        abort(404)
+    standing = get_leaderboard(kind, board_id).standing(own_score) if own_score is not None else None
+    return render_template("leaderboard.html", kind=kind, title=title, rows=leaderboard_rows(kind, board_id),
+                           standing=standing, name=current_user.username)
+
+def admin_summary_data():
+    """Get the aggregated rows the admin summary charts are drawn from"""
+    summary = subject_summary()
+    return {
+        'bar': [(name, top_score) for name, top_score, _ in summary],
+        'circle': [(name, attempts) for name, _, attempts in summary],
+    }
+
+@app.route("/export/<string:kind>.<string:fmt>")
+@login_required
+def export(kind, fmt):
+    if current_user.role != 0:
+        abort(403)
+    if kind not in EXPORTS or fmt not in EXPORT_FORMATS:
+        abort(404)
+    if fmt == "parquet" and not parquet_available():
+        abort(501, "Parquet export needs pyarrow installed on the server.")
+
+    columns, stmt = export_statement(
+        kind,
+        subject_id=request.args.get("subject_id", type=int),
+        quiz_id=request.args.get("quiz_id", type=int),
+        user_id=request.args.get("user_id", type=int)
+    )
+    chunks = iter_csv(columns, stmt) if fmt == "csv" else iter_parquet(columns, stmt)
+    mimetype = "text/csv" if fmt == "csv" else "application/vnd.apache.parquet"
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={"Content-Disposition": f"attachment; filename={kind}.{fmt}"}
+    )
 
 def get_user_quiz_scores(user_id):
     """Get all quiz scores for a specific user"""
@@ -609,7 +882,7 @@ def func():
     if not admin:
         admin = User(
             username='admin',
-            password=generate_password_hash('admin123', method='pbkdf2:sha256'),
+            password=password_hasher.hash('admin123'),
             email='admin@gmail.com',
             full_name='full_name',
             qualification='qualification',
@@ -621,13 +894,20 @@ def func():
     pass
 
 def search_by_subject(search_txt):
-    subjects=Subject.query.filter(Subject.name.ilike(f"%{search_txt}%")).all()
-    return subjects
+    if not search_enabled():
+        return Subject.query.filter(Subject.name.ilike(f"%{search_txt}%")).all()
+    return ranked(Subject, matching_ids('subjects', search_txt))
 
 def search_by_chapter(search_txt):
     # chapters=Chapter.query.filter(Chapter.name.ilike(f"%{search_txt}%"))
-    chapters=Chapter.query.filter(Chapter.name.ilike(f"%{search_txt}%")).all()
-    return chapters
+    if not search_enabled():
+        return Chapter.query.filter(Chapter.name.ilike(f"%{search_txt}%")).all()
+    return ranked(Chapter, matching_ids('chapters', search_txt))
+
+def ranked(model, ids):
+    """Load rows by id, keeping the order of ids"""
+    rows = {row.id: row for row in model.query.filter(model.id.in_(ids))} if ids else {}
+    return [rows[i] for i in ids if i in rows]
 
 def get_subject(id):
     subject=Subject.query.filter_by(id=id).first()
@@ -656,11 +936,6 @@ def get_chapter_name(name):
     chapter_name=Chapter.query.filter_by(name=name).first()
     return chapter_name
 
-def convert_duration_to_seconds(duration):
-    # Convert HH:MM to total seconds
-    time_obj = datetime.strptime(duration, "%H:%M")
-    return time_obj.hour * 3600 + time_obj.minute * 60
-
 
 # Define the custom filter
 @app.template_filter('time_format')
@@ -669,11 +944,81 @@ def format_time(seconds):
     minutes = (seconds % 3600) // 60
     return f"{hours:02}:{minutes:02}"
  
-#Initialize the database
-with app.app_context():
+@app.cli.command("rebuild-score-aggregates")
+def rebuild_score_aggregates_command():
+    """Recompute the per-subject score aggregates and the attempt trend buckets"""
+    rebuild_score_aggregates()
+    rebuild_attempt_buckets()
+    db.session.commit()
+    print("Score aggregates rebuilt.")
+
+@app.cli.command("import-questions")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--format", "fmt", type=click.Choice(["csv", "jsonl"]), help="Defaults to the file extension.")
+@click.option("--report", type=click.File("w"), default="-", help="Where to write rejected rows (CSV).")
+@click.option("--dry-run", is_flag=True, help="Validate without inserting anything.")
+def import_questions_command(path, fmt, report, dry_run):
+    """Bulk import questions from a CSV or JSONL file"""
+    fmt = fmt or ("jsonl" if path.lower().endswith((".jsonl", ".json")) else "csv")
+    writer = csv.writer(report)
+    writer.writerow(["line", "error"])
+    with open(path, encoding="utf-8-sig", newline="") as lines:
+        result = import_questions(lines, fmt, lambda line_no, message: writer.writerow([line_no, message]),
+                                  dry_run=dry_run)
+    click.echo(f"{result.imported} question(s) {'valid' if dry_run else 'imported'}, "
+               f"{result.rejected} row(s) rejected.", err=True)
+
+@app.cli.command("export")
+@click.argument("kind", type=click.Choice(EXPORTS))
+@click.option("--format", "fmt", type=click.Choice(EXPORT_FORMATS), default="csv")
+@click.option("--subject-id", type=int)
+@click.option("--quiz-id", type=int)
+@click.option("--user-id", type=int)
+@click.option("--output", "-o", type=click.Path(dir_okay=False), default="-", help="Defaults to stdout.")
+def export_command(kind, fmt, subject_id, quiz_id, user_id, output):
+    """Stream scores or answers to a CSV or Parquet file"""
+    columns, stmt = export_statement(kind, subject_id=subject_id, quiz_id=quiz_id, user_id=user_id)
+    chunks = iter_csv(columns, stmt) if fmt == "csv" else iter_parquet(columns, stmt)
+    with click.open_file(output, "wb") as out:
+        for chunk in chunks:
+            out.write(chunk.encode() if isinstance(chunk, str) else chunk)
+
+@app.cli.command("drain-submissions")
+def drain_submissions_command():
+    """Grade every queued quiz submission now"""
+    total = 0
+    while True:
+        count = drain_submissions()
+        if not count:
+            break
+        total += count
+    print(f"Graded {total} queued submissions.")
+
+@app.cli.command("init-db")
+def init_db_command():
+    """Create or upgrade the database schema and seed the admin account; run once per deploy"""
+    init_database()
+    print("Database ready.")
+
+def init_database():
     db.create_all()
+    upgrade_schema(db.engine)
+    ensure_score_aggregates()
     func()
 
+def create_app():
+    """The application as served by a production worker: caches warmed and background work started.
+
+    Routes are registered on the module-level app, so this prepares that app for the
+    calling process rather than building a new one. Run it once per worker process.
+    """
+    warm_up(app)
+    if app.config['SUBMISSION_QUEUE']:
+        start_submission_writer(app)
+    return app
+
 if __name__ == '__main__':
-    # app.run(debug=True)
-    app.run(host='0.0.0.0', port=10000)
\ No newline at end of file
+    # Development server; production runs wsgi.py under gunicorn with gunicorn.conf.py
+    with app.app_context():
+        init_database()
+    create_app().run(host='0.0.0.0', port=10000)
@@ -0,0 +1,162 @@
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import bindparam
+from models import db, QuizAttempt
+
+QUIZ_DEADLINE_GRACE = 30  # Seconds allowed past the deadline for a submit or autosave still in flight
+AUTOSAVE_FLUSH_INTERVAL = 5.0  # Seconds between writes of the buffered autosaves; must stay below the grace
+
+log = logging.getLogger(__name__)
+
+_pending = {}  # (user_id, quiz_id) -> (latest autosaved answers not yet written, when they were saved)
+_lock = threading.Lock()
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def convert_duration_to_seconds(duration):
+    # Convert HH:MM to total seconds
+    time_obj = datetime.strptime(duration, "%H:%M")
+    return time_obj.hour * 3600 + time_obj.minute * 60
+
+
+def start_attempt(quiz_id, user_id, time_limit):
+    """Record the start of a timed attempt; reopening the quiz during an attempt keeps its original deadline"""
+    now = datetime.utcnow()
+    attempt = QuizAttempt.query.filter_by(user_id=user_id, quiz_id=quiz_id).first()
+    if attempt is None:
+        attempt = QuizAttempt(user_id=user_id, quiz_id=quiz_id)
+        db.session.add(attempt)
+    elif attempt.submitted_at is None and now <= _with_grace(attempt.deadline):
+        return attempt
+
+    attempt.started_at = now
+    attempt.deadline = now + timedelta(seconds=time_limit)
+    attempt.answers = {}
+    attempt.saved_at = attempt.submitted_at = None
+    db.session.commit()
+    with _lock:
+        _pending.pop((user_id, quiz_id), None)
+    return attempt
+
+
+def attempt_state(quiz_id, user_id):
+    """Seconds left and the autosaved answers of the open attempt, or None when there is none"""
+    attempt = QuizAttempt.query.filter_by(user_id=user_id, quiz_id=quiz_id, submitted_at=None).first()
+    if attempt is None:
+        return None
+    with _lock:
+        buffered = _pending.get((user_id, quiz_id))
+    answers = buffered[0] if _is_newer(buffered, attempt) else attempt.answers
+    remaining = (attempt.deadline - datetime.utcnow()).total_seconds()
+    return {'remaining': max(int(remaining), 0), 'answers': answers}
+
+
+def autosave(quiz_id, user_id, answers):
+    """Buffer the latest answers of an open attempt; returns False when there is no open attempt or time is up.
+
+    The deadline is read from the attempt row, so a restart or submit made by another worker
+    is seen at once. Only the newest answers per attempt are kept and the flusher writes them
+    every AUTOSAVE_FLUSH_INTERVAL seconds, so frequent autosaves cost one UPDATE per attempt.
+    Autosaves are taken until AUTOSAVE_FLUSH_INTERVAL before the grace ends, so every one
+    accepted is written before finish_attempt falls back to the stored answers.
+    """
+    now = datetime.utcnow()
+    deadline = db.session.execute(
+        db.select(QuizAttempt.deadline).filter_by(user_id=user_id, quiz_id=quiz_id, submitted_at=None)
+    ).scalar()
+    if deadline is None or now > _with_grace(deadline) - timedelta(seconds=AUTOSAVE_FLUSH_INTERVAL):
+        return False
+    with _lock:
+        _pending[(user_id, quiz_id)] = (answers, now)
+    return True
+
+
+def finish_attempt(quiz_id, user_id, form):
+    """Close the open attempt inside the caller's transaction and return the answers to grade.
+
+    A submission after the deadline and its grace is graded on the newest answers autosaved
+    in time rather than on the late form: this process's buffered ones or those stored on
+    the attempt row, which by then hold every autosave other workers accepted. Returns
+    None when there is no open attempt to submit.
+    """
+    attempt = QuizAttempt.query.filter_by(user_id=user_id, quiz_id=quiz_id, submitted_at=None) \
+        .populate_existing().first()
+    with _lock:
+        buffered = _pending.pop((user_id, quiz_id), None)
+    if attempt is None:
+        return None
+
+    if _is_newer(buffered, attempt):
+        attempt.answers, attempt.saved_at = buffered
+    now = datetime.utcnow()
+    attempt.submitted_at = now
+    if now > _with_grace(attempt.deadline):
+        return attempt.answers
+    return form
+
+
+def flush_autosaves():
+    """Write the buffered autosaves with one executemany UPDATE and return how many attempts were buffered.
+
+    Answers are written only to attempts still open and within their deadline and grace,
+    so a flush never overwrites an attempt another worker submitted or restarted, and only
+    over answers saved earlier, so workers flushing out of order keep the newest ones.
+    """
+    with _lock:
+        pending = dict(_pending)
+        _pending.clear()
+    if not pending:
+        return 0
+
+    now = datetime.utcnow()
+    table = QuizAttempt.__table__
+    stmt = table.update().where(
+        table.c.user_id == bindparam('b_user_id'),
+        table.c.quiz_id == bindparam('b_quiz_id'),
+        table.c.submitted_at.is_(None),
+        table.c.deadline >= now - timedelta(seconds=QUIZ_DEADLINE_GRACE),
+        db.or_(table.c.saved_at.is_(None), table.c.saved_at < bindparam('b_saved_at'))
+    ).values(answers=bindparam('b_answers'), saved_at=bindparam('b_saved_at'))
+    try:
+        db.session.execute(stmt, [
+            {'b_user_id': user_id, 'b_quiz_id': quiz_id, 'b_answers': answers, 'b_saved_at': saved_at}
+            for (user_id, quiz_id), (answers, saved_at) in pending.items()
+        ])
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        with _lock:
+            for key, buffered in pending.items():
+                _pending.setdefault(key, buffered)  # Keep them for the next flush unless newer ones arrived
+        raise
+    return len(pending)
+
+
+def start_autosave_flusher(app):
+    """Start this process's background autosave flusher if it is not running"""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_run_flusher, args=(app,), name='autosave-flusher', daemon=True)
+            _flusher.start()
+
+
+def _run_flusher(app):
+    while True:
+        time.sleep(AUTOSAVE_FLUSH_INTERVAL)
+        try:
+            with app.app_context():
+                flush_autosaves()
+        except Exception:
+            log.exception("Writing autosaved answers failed, retrying")
+
+
+def _is_newer(buffered, attempt):
+    return buffered is not None and (attempt.saved_at is None or buffered[1] > attempt.saved_at)
+
+
+def _with_grace(deadline):
+    return deadline + timedelta(seconds=QUIZ_DEADLINE_GRACE)
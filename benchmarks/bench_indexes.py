@@ -0,0 +1,149 @@
+"""Grading and dashboard latency before and after upgrade_schema() on a synthetic database.
+
+    python benchmarks/bench_indexes.py --answers 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from sqlalchemy import text
+from models import db
+from catalog import load_catalog
+from migrations import upgrade_schema
+
+
+def build_database(args):
+    """Create the pre-upgrade schema (no secondary indexes) and fill it with synthetic rows"""
+    db.create_all()
+    with db.engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.drop(conn, checkfirst=True)
+
+    rng = random.Random(args.seed)
+    raw = db.engine.raw_connection()
+    cur = raw.cursor()
+    cur.executemany("INSERT INTO users (id, username, email, password, full_name, qualification, role, blocked) "
+                    "VALUES (?, ?, ?, 'x', 'x', 'x', 1, 0)",
+                    ((u, f"user{u}", f"user{u}@example.com") for u in range(1, args.users + 1)))
+
+    quiz_questions = {}
+    chapter_id = quiz_id = question_id = 0
+    for subject_id in range(1, args.subjects + 1):
+        cur.execute("INSERT INTO subjects (id, name, description) VALUES (?, ?, 'd')", (subject_id, f"subject{subject_id}"))
+        for _ in range(args.chapters):
+            chapter_id += 1
+            cur.execute("INSERT INTO chapters (id, name, no_of_question, description, subject_id) VALUES (?, ?, ?, 'd', ?)",
+                        (chapter_id, f"chapter{chapter_id}", args.questions, subject_id))
+            for _ in range(args.quizzes):
+                quiz_id += 1
+                cur.execute("INSERT INTO quizzes (id, quiz_name, chapter_id, no_of_question) VALUES (?, ?, ?, ?)",
+                            (quiz_id, f"quiz{quiz_id}", chapter_id, args.questions))
+                ids = list(range(question_id + 1, question_id + args.questions + 1))
+                question_id += args.questions
+                quiz_questions[quiz_id] = ids
+                cur.executemany("INSERT INTO questions (id, subject_id, chapter_id, quiz_id, question_title, "
+                                "question_statement, option1, option2, option3, option4, correct_option) "
+                                "VALUES (?, ?, ?, ?, 't', 's', 'a', 'b', 'c', 'd', ?)",
+                                ((q, subject_id, chapter_id, quiz_id, str(rng.randint(1, 4))) for q in ids))
+
+    # One score row per attempted (user, quiz) and one answer per question of that quiz
+    attempts = set()
+    while len(attempts) * args.questions < args.answers:
+        attempts.add((rng.randint(1, args.users), rng.randint(1, quiz_id)))
+    cur.executemany("INSERT INTO scores (quiz_id, user_id, total_scored) VALUES (?, ?, ?)",
+                    ((q, u, rng.randint(0, args.questions)) for u, q in attempts))
+    cur.executemany("INSERT INTO answers (question_id, user_id, answer_text, selected_answer, is_correct) "
+                    "VALUES (?, ?, 'a', ?, 0)",
+                    ((question, u, str(rng.randint(1, 4))) for u, q in attempts for question in quiz_questions[q]))
+    raw.commit()
+    raw.close()
+    return sorted(attempts)
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), statistics.mean(samples)
+
+
+def run_workloads(args, attempts):
+    rng = random.Random(args.seed + 1)
+
+    def dashboard():
+        db.session.expunge_all()
+        load_catalog(with_questions=True)
+
+    def scores_dashboard():
+        user_id = rng.randint(1, args.users)
+        db.session.execute(text(
+            "SELECT scores.id, quizzes.quiz_name, quizzes.no_of_question, scores.total_scored "
+            "FROM scores JOIN quizzes ON scores.quiz_id = quizzes.id WHERE scores.user_id = :u"
+        ), {'u': user_id}).all()
+
+    def grading():
+        # The statements post_start_quiz issues: answer key, bulk answer insert, score lookup and update
+        user_id, quiz_id = rng.choice(attempts)
+        key = db.session.execute(text("SELECT id, correct_option FROM questions WHERE quiz_id = :q"),
+                                 {'q': quiz_id}).all()
+        db.session.execute(text(
+            "INSERT INTO answers (question_id, user_id, answer_text, selected_answer, is_correct) "
+            "VALUES (:question_id, :user_id, 'a', '1', 0)"
+        ), [{'question_id': q, 'user_id': user_id} for q, _ in key])
+        db.session.execute(text("UPDATE scores SET total_scored = 1 WHERE user_id = :u AND quiz_id = :q"),
+                           {'u': user_id, 'q': quiz_id})
+        db.session.commit()
+
+    return {
+        'dashboard (catalog tree)': timed(dashboard, args.repeat),
+        'scores_dashboard': timed(scores_dashboard, args.repeat),
+        'grading (post_start_quiz)': timed(grading, args.repeat),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--answers', type=int, default=1_000_000)
+    parser.add_argument('--users', type=int, default=5_000)
+    parser.add_argument('--subjects', type=int, default=20)
+    parser.add_argument('--chapters', type=int, default=10, help='chapters per subject')
+    parser.add_argument('--quizzes', type=int, default=5, help='quizzes per chapter')
+    parser.add_argument('--questions', type=int, default=10, help='questions per quiz')
+    parser.add_argument('--repeat', type=int, default=50)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = Flask(__name__)
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///' + os.path.join(tmp, 'bench.sqlite')
+        db.init_app(app)
+        with app.app_context():
+            start = time.perf_counter()
+            attempts = build_database(args)
+            print(f"built {len(attempts)} scores / {len(attempts) * args.questions} answers "
+                  f"in {time.perf_counter() - start:.1f}s")
+
+            before = run_workloads(args, attempts)
+            start = time.perf_counter()
+            upgrade_schema(db.engine)
+            print(f"upgrade_schema took {time.perf_counter() - start:.1f}s")
+            after = run_workloads(args, attempts)
+
+    print(f"{'workload':<28}{'before p50 ms':>15}{'after p50 ms':>15}{'speedup':>10}")
+    for name, (p50, _) in before.items():
+        new_p50 = after[name][0]
+        print(f"{name:<28}{p50:>15.2f}{new_p50:>15.2f}{p50 / new_p50:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
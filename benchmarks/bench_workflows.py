@@ -0,0 +1,241 @@
+"""Latency, throughput and query counts of the main quiz workflows on a synthetic database.
+
+    python benchmarks/bench_workflows.py --output results.json
+    python benchmarks/bench_workflows.py --baseline results.json
+
+Builds a temporary SQLite database with the requested numbers of subjects,
+chapters, quizzes, questions, users and scores (seeded, so every run sees the
+same data) and drives the routes through the Flask test client. With
+--baseline it compares against an earlier --output file and exits with
+status 1 when a route's median got slower than --tolerance allows or it runs
+at least one more query per request.
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'bench'
+
+
+def build_database(args):
+    """Fill the (already created) schema with synthetic rows and return the quiz -> question ids map"""
+    from werkzeug.security import generate_password_hash
+    from models import db
+    from catalog import bump_catalog_version
+    from aggregates import rebuild_score_aggregates
+
+    rng = random.Random(args.seed)
+    password = generate_password_hash(PASSWORD, method='pbkdf2:sha256')
+    raw = db.engine.raw_connection()
+    cur = raw.cursor()
+    cur.executemany("INSERT INTO users (username, email, password, full_name, qualification, role, blocked) "
+                    "VALUES (?, ?, ?, 'x', 'x', 1, 0)",
+                    ((f"user{u}", f"user{u}@example.com", password) for u in range(args.users)))
+    user_ids = [row[0] for row in cur.execute("SELECT id FROM users WHERE role = 1 ORDER BY id")]
+
+    quiz_questions = {}
+    for s in range(args.subjects):
+        cur.execute("INSERT INTO subjects (name, description) VALUES (?, ?)",
+                    (f"subject {s}", f"all about subject {s}"))
+        subject_id = cur.lastrowid
+        for c in range(args.chapters):
+            cur.execute("INSERT INTO chapters (name, no_of_question, description, subject_id) VALUES (?, ?, ?, ?)",
+                        (f"chapter {s}.{c}", args.quizzes, f"chapter {c} of subject {s}", subject_id))
+            chapter_id = cur.lastrowid
+            for q in range(args.quizzes):
+                cur.execute("INSERT INTO quizzes (quiz_name, chapter_id, no_of_question) VALUES (?, ?, ?)",
+                            (f"quiz {s}.{c}.{q}", chapter_id, args.questions))
+                quiz_id = cur.lastrowid
+                cur.executemany("INSERT INTO questions (subject_id, chapter_id, quiz_id, question_title, "
+                                "question_statement, option1, option2, option3, option4, correct_option) "
+                                "VALUES (?, ?, ?, ?, ?, 'alpha', 'beta', 'gamma', 'delta', ?)",
+                                ((subject_id, chapter_id, quiz_id, f"question {i}", f"statement {i} of quiz {quiz_id}",
+                                  str(rng.randint(1, 4))) for i in range(args.questions)))
+                quiz_questions[quiz_id] = [row[0] for row in cur.execute(
+                    "SELECT id FROM questions WHERE quiz_id = ? ORDER BY id", (quiz_id,))]
+
+    # One score row per attempted (user, quiz)
+    quiz_ids = sorted(quiz_questions)
+    attempts = set()
+    target = min(args.scores, len(user_ids) * len(quiz_ids))
+    while len(attempts) < target:
+        attempts.add((rng.choice(user_ids), rng.choice(quiz_ids)))
+    cur.executemany("INSERT INTO scores (user_id, quiz_id, total_scored) VALUES (?, ?, ?)",
+                    ((u, q, rng.randint(0, args.questions)) for u, q in sorted(attempts)))
+    raw.commit()
+    raw.close()
+
+    rebuild_score_aggregates()
+    bump_catalog_version()
+    db.session.commit()
+    return quiz_questions
+
+
+def workloads(app, args, quiz_questions):
+    """(route name, function(i) -> response) pairs, each issuing one request"""
+    rng = random.Random(args.seed + 1)
+    quiz_ids = sorted(quiz_questions)
+
+    admin = app.test_client()
+    admin.post('/admin_login', data={'username': 'admin', 'password': 'admin123'})
+    students = []
+    for u in range(min(args.clients, args.users)):
+        client = app.test_client()
+        client.post('/user_login', data={'username': f"user{u}", 'password': PASSWORD})
+        students.append((f"user{u}", client))
+
+    def login(i):
+        return app.test_client().post('/user_login', data={'username': f"user{i % args.users}", 'password': PASSWORD})
+
+    def user_dashboard(i):
+        name, client = students[i % len(students)]
+        return client.get(f"/user_dashboard/{name}")
+
+    def quiz_manager(i):
+        return admin.get('/quiz_manager')
+
+    def start_quiz(i):
+        return students[i % len(students)][1].get(f"/start_quiz/{rng.choice(quiz_ids)}")
+
+    def post_start_quiz(i):
+        quiz_id = rng.choice(quiz_ids)
+        form = {f"answers_{q}": str(rng.randint(1, 4)) for q in quiz_questions[quiz_id]}
+        return students[i % len(students)][1].post(f"/post_start_quiz/{quiz_id}", data=form)
+
+    def admin_summary(i):
+        return admin.get('/admin_summary/admin')
+
+    def search(i):
+        return admin.post('/search/admin', data={'search_txt': f"subject {rng.randrange(args.subjects)}"})
+
+    return [
+        ('login', login),
+        ('user_dashboard', user_dashboard),
+        ('quiz_manager', quiz_manager),
+        ('start_quiz', start_quiz),
+        ('post_start_quiz', post_start_quiz),
+        ('admin_summary', admin_summary),
+        ('search', search),
+    ]
+
+
+def measure(fn, requests, warmup, queries):
+    for i in range(warmup):
+        fn(i)
+    samples = []
+    statements = 0
+    errors = 0
+    started = time.perf_counter()
+    for i in range(requests):
+        before = queries[0]
+        start = time.perf_counter()
+        response = fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+        statements += queries[0] - before
+        errors += response.status_code >= 400
+    elapsed = time.perf_counter() - started
+    cuts = statistics.quantiles(samples, n=100, method='inclusive')
+    return {
+        'requests': requests,
+        'errors': errors,
+        'p50_ms': round(statistics.median(samples), 3),
+        'p95_ms': round(cuts[94], 3),
+        'p99_ms': round(cuts[98], 3),
+        'throughput_rps': round(requests / elapsed, 1),
+        'queries_per_request': round(statements / requests, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Print the change against a baseline run and return the routes that regressed"""
+    if baseline['config'] != results['config']:
+        print("warning: baseline was recorded with a different configuration")
+    regressed = []
+    print(f"\n{'route':<18}{'base p50 ms':>13}{'p50 ms':>10}{'change':>9}{'base q/req':>12}{'q/req':>8}")
+    for name, current in results['routes'].items():
+        base = baseline['routes'].get(name)
+        if base is None:
+            continue
+        # The median is steady enough between runs to compare; tail latencies are reported but too noisy
+        change = current['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0.0
+        # Cache misses make the average query count wobble a little; a whole extra query per request is real
+        slower = change > tolerance or current['queries_per_request'] >= base['queries_per_request'] + 1
+        if slower:
+            regressed.append(name)
+        print(f"{name:<18}{base['p50_ms']:>13.2f}{current['p50_ms']:>10.2f}{change:>+9.0%}"
+              f"{base['queries_per_request']:>12}{current['queries_per_request']:>8}{'  REGRESSED' if slower else ''}")
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subjects', type=int, default=10)
+    parser.add_argument('--chapters', type=int, default=10, help='chapters per subject')
+    parser.add_argument('--quizzes', type=int, default=5, help='quizzes per chapter')
+    parser.add_argument('--questions', type=int, default=10, help='questions per quiz')
+    parser.add_argument('--users', type=int, default=2_000)
+    parser.add_argument('--scores', type=int, default=50_000)
+    parser.add_argument('--clients', type=int, default=20, help='logged-in students sharing the requests')
+    parser.add_argument('--requests', type=int, default=200, help='measured requests per route')
+    parser.add_argument('--login-requests', type=int, default=20, help='password hashing makes logins slow')
+    parser.add_argument('--warmup', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--routes', nargs='*', help='only run these routes')
+    parser.add_argument('--output', help='write the results as JSON')
+    parser.add_argument('--baseline', help='compare against the JSON of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed p50 slowdown, 0.25 = 25%%')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # app.py reads its settings at import time
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'bench.sqlite')
+        from sqlalchemy import event
+        from app import app, create_app, init_database
+        from models import db
+
+        queries = [0]
+        with app.app_context():
+            init_database()
+            start = time.perf_counter()
+            quiz_questions = build_database(args)
+            print(f"built {len(quiz_questions)} quizzes / {args.scores} scores in {time.perf_counter() - start:.1f}s")
+            event.listen(db.engine, 'before_cursor_execute', lambda *a: queries.__setitem__(0, queries[0] + 1))
+        create_app()
+
+        routes = {}
+        for name, fn in workloads(app, args, quiz_questions):
+            if args.routes and name not in args.routes:
+                continue
+            requests = args.login_requests if name == 'login' else args.requests
+            routes[name] = measure(fn, requests, args.warmup, queries)
+
+    config = {key: value for key, value in vars(args).items()
+              if key not in ('routes', 'output', 'baseline', 'tolerance')}
+    results = {'config': config, 'routes': routes}
+
+    print(f"{'route':<18}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'req/s':>9}{'q/req':>8}{'errors':>8}")
+    for name, r in routes.items():
+        print(f"{name:<18}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}{r['p99_ms']:>9.2f}"
+              f"{r['throughput_rps']:>9.1f}{r['queries_per_request']:>8}{r['errors']:>8}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressed = compare(results, json.load(f), args.tolerance)
+        if regressed:
+            print(f"\nregressed: {', '.join(regressed)}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""Quiz submission write throughput with N concurrent worker processes.
+
+    python benchmarks/load_submissions.py --workers 8 --submissions 200
+
+Each worker starts the app with create_app() against the same temporary
+SQLite file (the way separate server processes would), logs in as its own student and posts
+quiz submissions as fast as it can. Run it once with the defaults and once
+with e.g. SQLITE_JOURNAL_MODE=DELETE SQLITE_SYNCHRONOUS=FULL
+SQLITE_BUSY_TIMEOUT_MS=0 to compare against an untuned connection.
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+QUESTIONS = 10
+
+
+def prepare(workers):
+    from werkzeug.security import generate_password_hash
+    from app import app, init_database
+    from models import db, User, Subject, Chapter, Quiz, Question
+
+    with app.app_context():
+        init_database()
+        subject = Subject(name='Load', description='load test')
+        db.session.add(subject)
+        db.session.flush()
+        chapter = Chapter(name='Load', no_of_question=QUESTIONS, description='load test', subject_id=subject.id)
+        db.session.add(chapter)
+        db.session.flush()
+        quiz = Quiz(quiz_name='Load', chapter_id=chapter.id, no_of_question=QUESTIONS)
+        db.session.add(quiz)
+        db.session.flush()
+        for i in range(QUESTIONS):
+            db.session.add(Question(subject_id=subject.id, chapter_id=chapter.id, quiz_id=quiz.id,
+                                    question_title=f"Q{i}", question_statement='?', option1='a', option2='b',
+                                    option3='c', option4='d', correct_option='1'))
+        password = generate_password_hash('load', method='pbkdf2:sha256')
+        for w in range(workers):
+            db.session.add(User(username=f"load{w}", email=f"load{w}@example.com", password=password,
+                                full_name='load', qualification='load'))
+        db.session.commit()
+        return quiz.id, [q.id for q in quiz.questions]
+
+
+def submitter(worker, quiz_id, question_ids, submissions, ready, results):
+    from app import create_app
+
+    client = create_app().test_client()
+    client.post('/user_login', data={'username': f"load{worker}", 'password': 'load'})
+    form = {f"answers_{q}": '1' for q in question_ids}
+    ok = failed = 0
+    ready.wait()  # Start together once every worker has imported the app and logged in
+    for _ in range(submissions):
+        try:
+            response = client.post(f"/post_start_quiz/{quiz_id}", data=form)
+            if response.status_code == 200:
+                ok += 1
+            else:
+                failed += 1
+        except Exception:  # "database is locked" surfaces as an OperationalError
+            failed += 1
+    results.put((ok, failed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--submissions', type=int, default=200, help='submissions per worker')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(tmp, 'load.sqlite')
+        quiz_id, question_ids = prepare(args.workers)
+
+        ctx = multiprocessing.get_context('spawn')
+        ready = ctx.Barrier(args.workers + 1)
+        results = ctx.Queue()
+        procs = [ctx.Process(target=submitter, args=(w, quiz_id, question_ids, args.submissions, ready, results))
+                 for w in range(args.workers)]
+        for p in procs:
+            p.start()
+        ready.wait()
+        started = time.perf_counter()
+        totals = [results.get() for _ in procs]
+        elapsed = time.perf_counter() - started
+        for p in procs:
+            p.join()
+
+    ok = sum(t[0] for t in totals)
+    failed = sum(t[1] for t in totals)
+    pragmas = {k: v for k, v in os.environ.items() if k.startswith('SQLITE_')}
+    print(f"settings: {pragmas or 'defaults'}")
+    print(f"{args.workers} workers: {ok} submissions ok, {failed} failed in {elapsed:.2f}s "
+          f"-> {ok / elapsed:.0f} submissions/s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+import threading
+from datetime import datetime
+from collections import OrderedDict, namedtuple
+from types import MappingProxyType
+from sqlalchemy.orm import selectinload
+from models import db, Subject, Chapter, Quiz, Question, CatalogVersion
+
+# Immutable, session-free copies of the catalog rows; templates use the same attribute names as the models
+SubjectNode = namedtuple('SubjectNode', 'id name description chapters')
+ChapterNode = namedtuple('ChapterNode', 'id name no_of_question description subject_id quizzes')
+QuizNode = namedtuple('QuizNode', 'id quiz_name chapter_id no_of_question remarks question_pool duration questions')
+QuestionNode = namedtuple('QuestionNode', 'id subject_id chapter_id quiz_id question_title question_statement '
+                                          'option1 option2 option3 option4 correct_option')
+QuizQuestions = namedtuple('QuizQuestions', 'quiz answer_key')  # answer_key: ((question_id, correct_option), ...)
+
+CATALOG_CACHE_SIZE = 4  # Snapshots kept in memory per process
+QUIZ_QUESTIONS_CACHE_SIZE = 512  # Quizzes (and question pools) whose questions are kept in memory per process
+
+_snapshots = OrderedDict()  # (version, with_questions) -> CatalogSnapshot
+_questions = OrderedDict()  # ('quiz' | 'chapter', id, version) -> QuizQuestions or pooled question ids
+_lock = threading.Lock()
+_building = {}  # Cache key -> lock held while that entry builds
+
+
+class CatalogSnapshot:
+    def __init__(self, version, subjects, updated_at=None):
+        self.version = version
+        self.updated_at = updated_at
+        self.subjects = subjects
+        chapters = [c for s in subjects for c in s.chapters]
+        self.chapters = MappingProxyType({c.id: c for c in chapters})
+        self.chapter_list = tuple(sorted(chapters, key=lambda c: c.id))  # For keyset paging
+        self.chapter_ids = tuple(c.id for c in self.chapter_list)
+        self.subjects_by_id = MappingProxyType({s.id: s for s in subjects})
+        self.quizzes = MappingProxyType({q.id: q for c in chapters for q in c.quizzes})
+        # Same semantics as filter_by(name=...).first(): lowest id wins
+        self.subjects_by_name = MappingProxyType(_first_by_name(subjects))
+        self.chapters_by_name = MappingProxyType(_first_by_name(chapters))
+
+
+def _first_by_name(nodes):
+    by_name = {}
+    for node in nodes:
+        by_name.setdefault(node.name, node)
+    return by_name
+
+
+def load_catalog(with_questions=False):
+    """Load the Subject -> Chapter -> Quiz (-> Question) tree in a fixed number of queries"""
+    options = selectinload(Subject.chapters).selectinload(Chapter.quizzes)
+    if with_questions:
+        options = options.selectinload(Quiz.questions)
+    return Subject.query.options(options).order_by(Subject.id).all()
+
+
+def current_catalog_version():
+    """Read the catalog version shared by all worker processes"""
+    version = db.session.execute(
+        db.select(CatalogVersion.version).filter_by(id=1)
+    ).scalar()
+    return version or 0
+
+
+def bump_catalog_version():
+    """Bump the shared catalog version inside the caller's transaction; call before db.session.commit()"""
+    updated = db.session.execute(
+        db.update(CatalogVersion).filter_by(id=1).values(version=CatalogVersion.version + 1,
+                                                          updated_at=datetime.utcnow())
+    ).rowcount
+    if not updated:
+        db.session.add(CatalogVersion(id=1, version=1, updated_at=datetime.utcnow()))
+    with _lock:
+        _snapshots.clear()
+        _questions.clear()
+
+
+def get_catalog(with_questions=False):
+    """Return the immutable catalog snapshot for the current version, rebuilding it only when an admin changed it"""
+    version = current_catalog_version()
+
+    def build():
+        updated_at = db.session.execute(db.select(CatalogVersion.updated_at).filter_by(id=1)).scalar()
+        return CatalogSnapshot(version, _freeze(load_catalog(with_questions), with_questions), updated_at)
+
+    # Requests arriving right after a catalog change wait for one build instead of each loading the tree
+    return _get_or_build(_snapshots, (version, with_questions), build, CATALOG_CACHE_SIZE)
+
+
+def get_quiz_questions(catalog, quiz):
+    """Return the quiz node with its questions and answer key, loaded in one query per quiz and catalog version"""
+    def build():
+        questions = db.session.execute(
+            db.select(Question).filter_by(quiz_id=quiz.id).order_by(Question.id)
+        ).scalars().all()
+        node = quiz._replace(questions=tuple(_freeze_question(q) for q in questions))
+        return QuizQuestions(node, tuple((q.id, str(q.correct_option)) for q in node.questions))
+
+    return _get_or_build(_questions, ('quiz', quiz.id, catalog.version), build, QUIZ_QUESTIONS_CACHE_SIZE)
+
+
+def get_pool_question_ids(catalog, quiz):
+    """Return the ids, in order, of the questions a randomized quiz draws from"""
+    if quiz.question_pool == 'quiz':
+        return tuple(question.id for question in get_quiz_questions(catalog, quiz).quiz.questions)
+
+    def build():
+        return tuple(db.session.execute(
+            db.select(Question.id).filter_by(chapter_id=quiz.chapter_id).order_by(Question.id)
+        ).scalars())
+
+    return _get_or_build(_questions, ('chapter', quiz.chapter_id, catalog.version), build, QUIZ_QUESTIONS_CACHE_SIZE)
+
+
+def get_pool_questions(catalog, quiz, question_ids):
+    """Return the questions with the given ids from the quiz's pool, in the order given"""
+    if quiz.question_pool == 'quiz':
+        by_id = {question.id: question for question in get_quiz_questions(catalog, quiz).quiz.questions}
+    else:
+        by_id = {q.id: _freeze_question(q) for q in db.session.execute(
+            db.select(Question).where(Question.id.in_(question_ids))
+        ).scalars()}
+    return tuple(by_id[question_id] for question_id in question_ids if question_id in by_id)
+
+
+def _get_or_build(cache, key, build, size):
+    value = _cached(cache, key)
+    if value is not None:
+        return value
+    with _lock:
+        build_lock = _building.setdefault(key, threading.Lock())
+    with build_lock:
+        value = _cached(cache, key)
+        if value is None:
+            value = build()
+            with _lock:
+                cache[key] = value
+                while len(cache) > size:
+                    cache.popitem(last=False)
+                _building.pop(key, None)
+    return value
+
+
+def _cached(cache, key):
+    with _lock:
+        value = cache.get(key)
+        if value is not None:
+            cache.move_to_end(key)
+        return value
+
+
+def _freeze(subjects, with_questions):
+    return tuple(
+        SubjectNode(s.id, s.name, s.description, tuple(
+            ChapterNode(c.id, c.name, c.no_of_question, c.description, c.subject_id, tuple(
+                QuizNode(q.id, q.quiz_name, q.chapter_id, q.no_of_question, q.remarks, q.question_pool, q.duration,
+                         _freeze_questions(q) if with_questions else ())
+                for q in sorted(c.quizzes, key=lambda q: q.id)
+            ))
+            for c in sorted(s.chapters, key=lambda c: c.id)
+        ))
+        for s in subjects
+    )
+
+
+def _freeze_questions(quiz):
+    return tuple(_freeze_question(q) for q in sorted(quiz.questions, key=lambda q: q.id))
+
+
+def _freeze_question(q):
+    return QuestionNode(q.id, q.subject_id, q.chapter_id, q.quiz_id, q.question_title, q.question_statement,
+                        q.option1, q.option2, q.option3, q.option4, q.correct_option)
@@ -0,0 +1,86 @@
+import hashlib
+import io
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from matplotlib.figure import Figure
+from matplotlib.patches import Circle
+
+CHART_WORKERS = 2  # Renders running at once per process
+CHART_CACHE_SIZE = 32  # Rendered PNGs kept per process
+
+_executor = ThreadPoolExecutor(max_workers=CHART_WORKERS, thread_name_prefix='chart')
+_cache = OrderedDict()  # digest -> Future resolving to PNG bytes
+_lock = threading.RLock()  # Re-entered when a render fails before add_done_callback returns
+
+
+def chart_digest(kind, data):
+    """Digest of the aggregated data a chart is drawn from; identical data gives an identical image"""
+    payload = json.dumps([kind, data], sort_keys=True, default=str).encode()
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+def submit_chart(kind, data, digest=None):
+    """Start rendering a chart in the worker pool, or return the cached/in-flight render"""
+    digest = digest or chart_digest(kind, data)
+    with _lock:
+        future = _cache.get(digest)
+        if future is not None:
+            _cache.move_to_end(digest)
+            return future
+        future = _executor.submit(CHART_RENDERERS[kind], data)
+        _cache[digest] = future
+        future.add_done_callback(lambda f: f.exception() is not None and _forget(digest))
+        while len(_cache) > CHART_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return future
+
+
+def render_chart(kind, data, digest=None):
+    """Return the PNG bytes of a chart, rendering it at most once per distinct data set"""
+    return submit_chart(kind, data, digest).result()
+
+
+def _forget(digest):
+    with _lock:
+        _cache.pop(digest, None)
+
+
+def _png(fig):
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', bbox_inches='tight')
+    return buf.getvalue()
+
+
+def _bar_chart(subject_scores):
+    # Figure objects are independent of pyplot's global state, so renders can run in parallel
+    fig = Figure(figsize=(10, 5))
+    ax = fig.subplots()
+    subjects = [s[0] for s in subject_scores]
+    scores = [s[1] for s in subject_scores]
+    colors = ['skyblue', 'red', 'green', 'yellow', 'pink']
+    ax.bar(subjects, scores, color=colors)
+    ax.set_title('Subject-wise Top Scores')
+    ax.set_xlabel('Subjects')
+    ax.set_ylabel('Scores')
+    return _png(fig)
+
+
+def _circle_chart(subject_attempts):
+    fig = Figure()
+    ax = fig.subplots()
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1)
+    ax.add_artist(Circle((0.5, 0.5), 0.4, color='yellow', fill=False))
+    ax.add_artist(Circle((0.5, 0.5), 0.3, color='blue', fill=False))
+    ax.add_artist(Circle((0.5, 0.5), 0.2, color='red', fill=False))
+    ax.axis('off')
+    ax.set_title('Subject-wise User Attempts')
+    return _png(fig)
+
+
+CHART_RENDERERS = {
+    'bar': _bar_chart,
+    'circle': _circle_chart,
+}
@@ -0,0 +1,112 @@
+import logging
+import threading
+from models import db, Subject, Chapter, Quiz, Question, Scores, Answer, Attempt
+from aggregates import rebuild_score_aggregates
+from catalog import bump_catalog_version
+from leaderboards import forget_leaderboard
+
+DELETE_BATCH_ROWS = 5000  # Rows removed per transaction by a background delete
+DELETE_KINDS = {'subject': Subject, 'chapter': Chapter, 'quiz': Quiz}
+
+log = logging.getLogger(__name__)
+
+_running = set()  # (kind, id) of the background deletes in progress
+_running_lock = threading.Lock()
+
+
+def _question_ids(kind, node_id):
+    return db.select(Question.id).where(getattr(Question, f"{kind}_id") == node_id)
+
+
+def _quiz_ids(kind, node_id):
+    if kind == 'quiz':
+        return db.select(Quiz.id).filter_by(id=node_id)
+    if kind == 'chapter':
+        return db.select(Quiz.id).filter_by(chapter_id=node_id)
+    return db.select(Quiz.id).join(Chapter, Chapter.id == Quiz.chapter_id).filter(Chapter.subject_id == node_id)
+
+
+def _subject_id(kind, node_id):
+    if kind == 'subject':
+        return node_id
+    if kind == 'chapter':
+        return db.session.execute(db.select(Chapter.subject_id).filter_by(id=node_id)).scalar()
+    return db.session.execute(
+        db.select(Chapter.subject_id).join(Quiz, Quiz.chapter_id == Chapter.id).filter(Quiz.id == node_id)
+    ).scalar()
+
+
+def count_answers(kind, node_id, limit):
+    """Answers under a subject, chapter or quiz, counted no further than limit"""
+    answers = db.select(Answer.id).where(Answer.question_id.in_(_question_ids(kind, node_id))).limit(limit)
+    return db.session.execute(db.select(db.func.count()).select_from(answers.subquery())).scalar()
+
+
+def delete_node(kind, node_id):
+    """Delete a subject, chapter or quiz inside the caller's transaction.
+
+    One DELETE of the row; the database's ON DELETE CASCADE removes the chapters, quizzes,
+    questions, answers and scores under it, and the aggregates of its subject are recomputed.
+    """
+    subject_id = _subject_id(kind, node_id)
+    db.session.execute(db.delete(DELETE_KINDS[kind]).filter_by(id=node_id))
+    if subject_id is not None:
+        rebuild_score_aggregates(subject_id)
+        forget_leaderboard('subject', subject_id)
+    if kind == 'quiz':
+        forget_leaderboard('quiz', node_id)
+    bump_catalog_version()
+
+
+def purge_dependents(kind, node_id, batch=DELETE_BATCH_ROWS):
+    """Delete the answers and scores under a node and unlink its attempts, batch rows per transaction.
+
+    Each transaction is short, so other writers get the write lock in between; what is
+    left for delete_node's cascade is the catalog rows themselves.
+    """
+    questions = _question_ids(kind, node_id)
+    quizzes = _quiz_ids(kind, node_id)
+    statements = (
+        lambda: db.delete(Answer).where(Answer.id.in_(
+            db.select(Answer.id).where(Answer.question_id.in_(questions)).limit(batch))),
+        lambda: db.update(Attempt).where(Attempt.id.in_(
+            db.select(Attempt.id).where(Attempt.quiz_id.in_(quizzes)).limit(batch))).values(quiz_id=None),
+        lambda: db.delete(Scores).where(Scores.id.in_(
+            db.select(Scores.id).where(Scores.quiz_id.in_(quizzes)).limit(batch))),
+    )
+    total = 0
+    for statement in statements:
+        while True:
+            count = db.session.execute(statement(), execution_options={'synchronize_session': False}).rowcount
+            db.session.commit()
+            total += count
+            if count < batch:
+                break
+    return total
+
+
+def start_background_delete(app, kind, node_id):
+    """Purge a large node in batches on a background thread, then delete it; False if it is already being deleted"""
+    with _running_lock:
+        if (kind, node_id) in _running:
+            return False
+        _running.add((kind, node_id))
+    threading.Thread(target=_run_delete, args=(app, kind, node_id), name=f"delete-{kind}-{node_id}",
+                     daemon=True).start()
+    return True
+
+
+def _run_delete(app, kind, node_id):
+    try:
+        with app.app_context():
+            try:
+                rows = purge_dependents(kind, node_id)
+                delete_node(kind, node_id)
+                db.session.commit()
+                log.info("Deleted %s %s after purging %d dependent rows", kind, node_id, rows)
+            except Exception:
+                db.session.rollback()
+                log.exception("Background delete of %s %s failed", kind, node_id)
+    finally:
+        with _running_lock:
+            _running.discard((kind, node_id))
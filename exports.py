@@ -0,0 +1,131 @@
+import csv
+import io
+from models import db, User, Subject, Chapter, Quiz, Question, Scores, Answer
+
+try:  # Parquet export is optional: pip install pyarrow
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
+EXPORT_CHUNK_ROWS = 5000  # Rows fetched from the cursor and written per chunk / Parquet row group
+
+# Exported column names and types, in output order
+SCORE_COLUMNS = (
+    ('score_id', 'int'), ('user_id', 'int'), ('username', 'str'), ('subject_id', 'int'), ('subject_name', 'str'),
+    ('chapter_id', 'int'), ('chapter_name', 'str'), ('quiz_id', 'int'), ('quiz_name', 'str'),
+    ('no_of_question', 'int'), ('total_scored', 'int'),
+)
+ANSWER_COLUMNS = (
+    ('answer_id', 'int'), ('user_id', 'int'), ('username', 'str'), ('subject_id', 'int'), ('chapter_id', 'int'),
+    ('quiz_id', 'int'), ('question_id', 'int'), ('selected_answer', 'str'), ('answer_text', 'str'),
+    ('is_correct', 'bool'),
+)
+EXPORTS = ('scores', 'answers')
+EXPORT_FORMATS = ('csv', 'parquet')
+
+
+def parquet_available():
+    return pq is not None
+
+
+def export_statement(kind, subject_id=None, quiz_id=None, user_id=None):
+    """Build the (columns, select) pair for an export, ordered by id so exports are reproducible"""
+    if kind == 'scores':
+        stmt = db.select(
+            Scores.id, Scores.user_id, User.username, Subject.id, Subject.name, Chapter.id, Chapter.name,
+            Quiz.id, Quiz.quiz_name, Quiz.no_of_question, Scores.total_scored
+        ).join(
+            User, Scores.user_id == User.id
+        ).join(
+            Quiz, Scores.quiz_id == Quiz.id
+        ).join(
+            Chapter, Quiz.chapter_id == Chapter.id
+        ).join(
+            Subject, Chapter.subject_id == Subject.id
+        ).order_by(Scores.id)
+        filters = {Subject.id: subject_id, Quiz.id: quiz_id, Scores.user_id: user_id}
+        columns = SCORE_COLUMNS
+    elif kind == 'answers':
+        stmt = db.select(
+            Answer.id, Answer.user_id, User.username, Question.subject_id, Question.chapter_id, Question.quiz_id,
+            Answer.question_id, Answer.selected_answer, Answer.answer_text, Answer.is_correct
+        ).join(
+            User, Answer.user_id == User.id
+        ).join(
+            Question, Answer.question_id == Question.id
+        ).order_by(Answer.id)
+        filters = {Question.subject_id: subject_id, Question.quiz_id: quiz_id, Answer.user_id: user_id}
+        columns = ANSWER_COLUMNS
+    else:
+        raise ValueError(f"unknown export {kind!r}")
+
+    for column, value in filters.items():
+        if value is not None:
+            stmt = stmt.filter(column == value)
+    return columns, stmt
+
+
+def iter_chunks(stmt):
+    """Stream result rows in chunks through a server-side cursor instead of loading them all"""
+    result = db.session.execute(stmt.execution_options(yield_per=EXPORT_CHUNK_ROWS))
+    for chunk in result.partitions():
+        yield chunk
+
+
+def iter_csv(columns, stmt):
+    """Yield the export as CSV text, one chunk of rows at a time"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow([name for name, _ in columns])
+    for chunk in iter_chunks(stmt):
+        writer.writerows(chunk)
+        yield _drain(buf)
+    yield _drain(buf)
+
+
+def iter_parquet(columns, stmt):
+    """Yield the export as Parquet bytes, writing one row group per chunk"""
+    if not parquet_available():
+        raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+    types = {'int': pa.int64(), 'str': pa.string(), 'bool': pa.bool_()}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    sink = _Sink()
+    with pq.ParquetWriter(sink, schema) as writer:
+        for chunk in iter_chunks(stmt):
+            writer.write_table(pa.Table.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*chunk), schema)],
+                schema=schema
+            ))
+            yield sink.drain()
+    yield sink.drain()
+
+
+def _drain(buf):
+    data = buf.getvalue()
+    buf.seek(0)
+    buf.truncate()
+    return data
+
+
+class _Sink(io.RawIOBase):
+    """Write-only file that hands out what has been written so far, so Parquet can be streamed"""
+
+    def __init__(self):
+        super().__init__()
+        self._buf = io.BytesIO()
+        self._pos = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self._buf.write(data)
+        self._pos += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._pos
+
+    def drain(self):
+        return _drain(self._buf)
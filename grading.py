@@ -0,0 +1,94 @@
+from collections import namedtuple
+from datetime import datetime
+from sqlalchemy.dialects import postgresql, sqlite
+from models import db, Scores, Answer, Attempt, AttemptBucket
+from aggregates import record_score, bucket_starts
+from leaderboards import record_leaderboard_change
+
+GradeResult = namedtuple('GradeResult', 'score selected')
+
+# Dialects with INSERT ... ON CONFLICT DO UPDATE
+_UPSERT_INSERTS = {'sqlite': sqlite.insert, 'postgresql': postgresql.insert}
+
+
+def grade_submission(quiz, subject_id, user_id, answer_key, form):
+    """Score a submitted quiz form in one pass and persist answers and score in a single transaction"""
+    result = apply_submission(quiz, subject_id, user_id, answer_key, form)
+    db.session.commit()
+    return result
+
+
+def apply_submission(quiz, subject_id, user_id, answer_key, form, attempted_at=None):
+    """Score a submission and write its answers, score, attempt and aggregates inside the caller's transaction"""
+    options = {q.id: (q.option1, q.option2, q.option3, q.option4) for q in quiz.questions}
+    rows = []
+    selected = []
+    score = 0
+    for question_id, correct_option in answer_key:
+        user_answer = form.get(f"answers_{question_id}")
+        selected.append(user_answer)
+        is_correct = user_answer is not None and user_answer == correct_option
+        if is_correct:
+            score += 1
+        rows.append({
+            'question_id': question_id,
+            'user_id': user_id,
+            'answer_text': _option_text(options.get(question_id), user_answer),
+            'selected_answer': user_answer or '',
+            'is_correct': is_correct,
+        })
+
+    if rows:
+        db.session.execute(db.insert(Answer), rows)
+    old_score = save_score(quiz.id, user_id, score)
+    old_total, new_total = record_score(subject_id, user_id, old_score, score)
+    record_leaderboard_change('quiz', quiz.id, user_id, old_score, score)
+    record_leaderboard_change('subject', subject_id, user_id, old_total, new_total)
+    save_attempt(quiz.id, user_id, score, attempted_at or datetime.utcnow())
+    return GradeResult(score, selected)
+
+
+def save_score(quiz_id, user_id, score):
+    """Upsert the (user, quiz) score row inside the caller's transaction and return the score it replaced"""
+    old_score = db.session.execute(
+        db.select(Scores.total_scored).filter_by(quiz_id=quiz_id, user_id=user_id)
+    ).scalar()
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    if insert is None:
+        updated = db.session.execute(
+            db.update(Scores).filter_by(quiz_id=quiz_id, user_id=user_id).values(total_scored=score)
+        ).rowcount
+        if not updated:
+            db.session.execute(db.insert(Scores).values(quiz_id=quiz_id, user_id=user_id, total_scored=score))
+        return old_score
+    db.session.execute(
+        insert(Scores).values(quiz_id=quiz_id, user_id=user_id, total_scored=score)
+        .on_conflict_do_update(index_elements=['user_id', 'quiz_id'], set_={'total_scored': score})
+    )
+    return old_score
+
+
+def save_attempt(quiz_id, user_id, score, attempted_at):
+    """Append the attempt to the history and count it in the user's monthly and weekly buckets"""
+    db.session.execute(db.insert(Attempt).values(
+        quiz_id=quiz_id, user_id=user_id, total_scored=score, attempted_at=attempted_at
+    ))
+    insert = _UPSERT_INSERTS.get(db.session.get_bind().dialect.name)
+    for period, bucket_start in bucket_starts(attempted_at.date()).items():
+        key = {'user_id': user_id, 'period': period, 'bucket_start': bucket_start}
+        increments = {'attempts': AttemptBucket.attempts + 1, 'total_scored_sum': AttemptBucket.total_scored_sum + score}
+        if insert is None:
+            updated = db.session.execute(db.update(AttemptBucket).filter_by(**key).values(increments)).rowcount
+            if not updated:
+                db.session.execute(db.insert(AttemptBucket).values(**key, attempts=1, total_scored_sum=score))
+            continue
+        db.session.execute(
+            insert(AttemptBucket).values(**key, attempts=1, total_scored_sum=score)
+            .on_conflict_do_update(index_elements=['user_id', 'period', 'bucket_start'], set_=increments)
+        )
+
+
+def _option_text(options, user_answer):
+    if not options or user_answer not in ('1', '2', '3', '4'):
+        return ''
+    return options[int(user_answer) - 1]
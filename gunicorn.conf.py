@@ -0,0 +1,21 @@
+"""Gunicorn settings, read automatically from the working directory; each can be overridden from the environment"""
+import multiprocessing
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', 10000)}"
+# Worker processes: grading, chart rendering and template rendering are CPU bound and hold the GIL
+workers = int(os.environ.get('WEB_CONCURRENCY', min(multiprocessing.cpu_count() * 2 + 1, 8)))
+# Threads per worker, for requests waiting on the database or password hashing; keep at most DB_POOL_SIZE + DB_MAX_OVERFLOW
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread'
+# Each worker imports wsgi.py itself and warms its own caches, connection pool and background
+# threads before it accepts a connection; none of those survive a fork from a preloaded master
+preload_app = False
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))  # Seconds a silent worker (including its warmup) lives before it is restarted
+graceful_timeout = int(os.environ.get('WEB_GRACEFUL_TIMEOUT', 30))  # Seconds in-flight requests get to finish on shutdown
+keepalive = int(os.environ.get('WEB_KEEPALIVE', 5))
+# Recycle workers now and then so a slow leak can't grow forever; the jitter keeps them from restarting together
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 10000))
+max_requests_jitter = int(os.environ.get('WEB_MAX_REQUESTS_JITTER', 1000))
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-')
+loglevel = os.environ.get('WEB_LOG_LEVEL', 'info')
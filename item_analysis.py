@@ -0,0 +1,218 @@
+import logging
+import threading
+import time
+from itertools import chain
+from collections import OrderedDict, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+from flask import current_app
+from models import db, Answer, Question, Scores
+from catalog import current_catalog_version
+
+ITEM_ANALYSIS_TTL = 300  # Seconds a quiz's statistics are served before they are recomputed in the background
+ITEM_ANALYSIS_CACHE_SIZE = 1024  # Quizzes kept per process
+ANALYSIS_WORKERS = 1  # Background computations running at once per process
+ANALYSIS_CHUNK_ROWS = 200000  # Answer rows converted to arrays at a time
+ANALYSIS_SCAN_SHARE = 0.25  # Above this share of all questions one pass over the whole answers table beats index lookups
+DISTRACTOR_MIN_SHARE = 0.05  # A wrong option picked by fewer respondents than this is not doing its job
+
+# options are the shares of respondents per option 1-4; blank is the share that skipped the question.
+# distractors maps each wrong option to whether it is effective: picked by at least DISTRACTOR_MIN_SHARE
+# and by students with a lower mean quiz score than those who answered correctly.
+ItemStats = namedtuple('ItemStats', 'question_id responses difficulty discrimination options blank distractors')
+
+# The chosen option as a number, 0 when blank or not an option
+_OPTION = db.case({'1': 1, '2': 2, '3': 3, '4': 4}, value=Answer.selected_answer, else_=0)
+
+_executor = ThreadPoolExecutor(max_workers=ANALYSIS_WORKERS, thread_name_prefix='item-analysis')
+_results = OrderedDict()  # quiz_id -> (computed at, catalog version, [ItemStats])
+_computing = {}  # quiz_id -> Future of the background computation that will fill it in
+_lock = threading.Lock()
+
+log = logging.getLogger(__name__)
+
+
+def item_analysis(quiz_ids):
+    """Per-question statistics for the quizzes that have them, as {quiz_id: [ItemStats]}.
+
+    Quizzes never analysed, or whose statistics are older than ITEM_ANALYSIS_TTL or an
+    admin change, are computed in one background pass; the former are missing from the
+    result until it finishes and the latter are served stale meanwhile.
+    """
+    version = current_catalog_version()
+    now = time.monotonic()
+    found = {}
+    refresh = []
+    with _lock:
+        for quiz_id in quiz_ids:
+            cached = _results.get(quiz_id)
+            if cached is not None:
+                _results.move_to_end(quiz_id)
+                found[quiz_id] = cached[2]
+            if (cached is None or cached[1] != version or now - cached[0] >= ITEM_ANALYSIS_TTL) \
+                    and quiz_id not in _computing:
+                refresh.append(quiz_id)
+        if refresh:
+            future = _executor.submit(_compute, current_app._get_current_object(), refresh, version)
+            for quiz_id in refresh:
+                _computing[quiz_id] = future
+    return found
+
+
+def _compute(app, quiz_ids, version):
+    try:
+        with app.app_context():
+            computed = analyze_quizzes(quiz_ids)
+        now = time.monotonic()
+        with _lock:
+            for quiz_id, items in computed.items():
+                _results[quiz_id] = (now, version, items)
+                _results.move_to_end(quiz_id)
+            while len(_results) > ITEM_ANALYSIS_CACHE_SIZE:
+                _results.popitem(last=False)
+    except Exception:
+        log.exception("Item analysis of quizzes %s failed", quiz_ids)
+    finally:
+        with _lock:
+            for quiz_id in quiz_ids:
+                _computing.pop(quiz_id, None)
+
+
+def analyze_quizzes(quiz_ids):
+    """Compute the statistics of the given quizzes from the answers table without caching"""
+    correct_options = {}
+    quiz_of = {}
+    for question_id, quiz_id, correct_option in db.session.execute(
+        db.select(Question.id, Question.quiz_id, Question.correct_option).filter(Question.quiz_id.in_(quiz_ids))
+    ):
+        correct_options[question_id] = int(correct_option) if correct_option in ('1', '2', '3', '4') else 0
+        quiz_of[question_id] = quiz_id
+
+    total_questions = db.session.execute(db.select(db.func.count(Question.id))).scalar()
+    scan = len(quiz_of) > ANALYSIS_SCAN_SHARE * total_questions
+    columns = load_answer_columns(quiz_ids, quiz_of, scan)
+    items = compute_item_stats(*columns, correct_options)
+    result = {quiz_id: [] for quiz_id in quiz_ids}
+    for item in items:
+        if item.question_id in quiz_of:
+            result[quiz_of[item.question_id]].append(item)
+    return result
+
+
+def load_answer_columns(quiz_ids, quiz_of, scan=False):
+    """Stream the answers of the quizzes into (question_id, option, is_correct, score) integer arrays.
+
+    Rows are fetched in chunks of ANALYSIS_CHUNK_ROWS; the student's score on the
+    question's quiz (-1 when there is none) is joined in NumPy instead of per row in SQL.
+    With scan the whole table is read in order and the other quizzes' answers are masked out.
+    """
+    answers_query = db.select(Answer.question_id, Answer.user_id, _OPTION, db.case((Answer.is_correct, 1), else_=0))
+    if not scan:
+        answers_query = answers_query.filter(Answer.question_id.in_(
+            db.select(Question.id).filter(Question.quiz_id.in_(quiz_ids))
+        ))
+    scores_query = db.select(Scores.user_id, Scores.quiz_id, db.func.coalesce(Scores.total_scored, -1)) \
+        .filter(Scores.quiz_id.in_(quiz_ids))
+
+    known = np.array(sorted(quiz_of), dtype=np.int64)
+    chunks = [chunk[np.isin(chunk[:, 0], known)] if scan else chunk for chunk in _fetch_chunks(answers_query, 4)]
+    score_rows = np.concatenate(list(_fetch_chunks(scores_query, 3)) or [np.empty((0, 3), dtype=np.int64)])
+    answers = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.int64)
+    question_ids, user_ids = answers[:, 0], answers[:, 1]
+
+    # (user, quiz) keys of the scores, sorted, looked up for every answer
+    quizzes = np.array([quiz_of[question_id] for question_id in known.tolist()], dtype=np.int64)
+    position = np.clip(np.searchsorted(known, question_ids), 0, max(len(known) - 1, 0))
+    answer_quiz = quizzes[position] if len(known) else np.zeros_like(question_ids)
+    stride = int(max(quiz_ids)) + 1
+    score_keys = score_rows[:, 0] * stride + score_rows[:, 1]
+    order = np.argsort(score_keys)
+    score_keys, score_values = score_keys[order], score_rows[order, 2]
+    answer_keys = user_ids * stride + answer_quiz
+    found = np.clip(np.searchsorted(score_keys, answer_keys), 0, max(len(score_keys) - 1, 0))
+    if len(score_keys):
+        scores = np.where(score_keys[found] == answer_keys, score_values[found], -1)
+    else:
+        scores = np.full(len(answers), -1, dtype=np.int64)
+    return question_ids, answers[:, 2], answers[:, 3], scores
+
+
+def _fetch_chunks(query, width):
+    """Run a Core query on the DB-API cursor and yield its rows as int64 arrays of up to ANALYSIS_CHUNK_ROWS rows.
+
+    fetchmany hands over plain tuples, so SQLAlchemy's per-row result processing is skipped.
+    """
+    connection = db.session.connection()
+    compiled = query.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+    cursor = connection.connection.cursor()
+    try:
+        cursor.execute(str(compiled), params)
+        while True:
+            rows = cursor.fetchmany(ANALYSIS_CHUNK_ROWS)
+            if not rows:
+                break
+            yield np.fromiter(chain.from_iterable(rows), dtype=np.int64, count=len(rows) * width).reshape(-1, width)
+    finally:
+        cursor.close()
+
+
+def compute_item_stats(question_ids, options, is_correct, scores, correct_options):
+    """Vectorized difficulty, point-biserial discrimination, option shares and distractor checks per question"""
+    if not len(question_ids):
+        return []
+    ids, item = np.unique(question_ids, return_inverse=True)
+    n_items = len(ids)
+    options = np.where((options >= 1) & (options <= 4), options, 0)
+    correct = is_correct.astype(bool)
+
+    responses = np.bincount(item, minlength=n_items)
+    right = np.bincount(item, weights=correct, minlength=n_items)
+    option_counts = np.bincount(item * 5 + options, minlength=n_items * 5).reshape(n_items, 5)
+
+    # Point-biserial over answers whose student has a score: (M1 - M0) / s * sqrt(p * q)
+    scored = scores >= 0
+    s_item, s_score, s_correct = item[scored], scores[scored].astype(float), correct[scored]
+    n = np.bincount(s_item, minlength=n_items)
+    n1 = np.bincount(s_item, weights=s_correct, minlength=n_items)
+    total = np.bincount(s_item, weights=s_score, minlength=n_items)
+    total1 = np.bincount(s_item, weights=s_score * s_correct, minlength=n_items)
+    total_sq = np.bincount(s_item, weights=s_score ** 2, minlength=n_items)
+    option_score = np.bincount(s_item * 5 + options[scored], weights=s_score,
+                               minlength=n_items * 5).reshape(n_items, 5)
+    option_scored = np.bincount(s_item * 5 + options[scored], minlength=n_items * 5).reshape(n_items, 5)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difficulty = right / responses
+        n0 = n - n1
+        mean1 = total1 / n1
+        mean0 = (total - total1) / n0
+        std = np.sqrt(np.maximum(total_sq / n - (total / n) ** 2, 0))
+        p = n1 / n
+        discrimination = (mean1 - mean0) / std * np.sqrt(p * (1 - p))
+        shares = option_counts / responses[:, None]
+        option_mean = option_score / option_scored
+
+    items = []
+    for i, question_id in enumerate(ids.tolist()):
+        key = correct_options.get(question_id, 0)
+        distractors = {
+            option: bool(shares[i, option] >= DISTRACTOR_MIN_SHARE and option_mean[i, option] < mean1[i])
+            for option in (1, 2, 3, 4) if option != key
+        }
+        items.append(ItemStats(
+            question_id,
+            int(responses[i]),
+            float(difficulty[i]),
+            _finite(discrimination[i]),
+            tuple(float(share) for share in shares[i, 1:]),
+            float(shares[i, 0]),
+            distractors
+        ))
+    return items
+
+
+def _finite(value):
+    return float(value) if np.isfinite(value) else None
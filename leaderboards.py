@@ -0,0 +1,212 @@
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import defaultdict, namedtuple
+from sqlalchemy import event
+from models import db, User, Scores, UserSubjectScoreStats
+
+LEADERBOARD_TTL = 60  # Seconds before a board is reloaded from the database to pick up other processes' writes
+LEADERBOARD_TOP = 10  # Rows shown on a leaderboard page
+LEADERBOARD_KINDS = ('quiz', 'subject')
+
+# rank is shared by equal scores ("1, 2, 2, 4"); percentile is the share of students with a lower score
+Standing = namedtuple('Standing', 'score rank total percentile')
+LeaderboardRow = namedtuple('LeaderboardRow', 'rank user_id username score')
+
+_boards = {}  # (kind, id) -> RankedScores
+_load_locks = {}  # (kind, id) -> lock held by the one request reloading that board
+_loading = {}  # (kind, id) -> changes committed while the board was being reloaded, replayed onto the result
+_lock = threading.Lock()
+
+
+class RankedScores:
+    """The scores on one quiz or subject, best first, as a sorted array of packed int64 keys.
+
+    A key is -score << 32 | user_id, so an entry costs 8 bytes and ordering the keys orders
+    students by score, ties by id. Ranks and percentiles are binary searches; a change
+    shifts the tail of the array with a memmove.
+    """
+    __slots__ = ('keys', 'loaded_at')
+
+    def __init__(self, entries=()):
+        self.keys = array('q', sorted(_key(user_id, score) for user_id, score in entries))
+        self.loaded_at = time.monotonic()
+
+    def __len__(self):
+        return len(self.keys)
+
+    def update(self, user_id, old_score, new_score):
+        """Move a student from old_score (None when new) to new_score; a change already loaded is left alone"""
+        if old_score is not None:
+            i = bisect_left(self.keys, _key(user_id, old_score))
+            if i == len(self.keys) or self.keys[i] != _key(user_id, old_score):
+                return
+            del self.keys[i]
+        key = _key(user_id, new_score)
+        i = bisect_left(self.keys, key)
+        if i == len(self.keys) or self.keys[i] != key:
+            self.keys.insert(i, key)
+
+    def standing(self, score):
+        total = len(self.keys)
+        ahead = bisect_left(self.keys, -score << 32)
+        below = total - bisect_left(self.keys, -(score - 1) << 32)
+        return Standing(score, ahead + 1, total, round(100 * below / total) if total else 0)
+
+    def top(self, n):
+        """(rank, user_id, score) of the first n entries"""
+        rows = []
+        rank = 0
+        previous = None
+        for i, key in enumerate(self.keys[:n]):
+            score = -(key >> 32)
+            if score != previous:
+                rank, previous = i + 1, score
+            rows.append((rank, key & 0xFFFFFFFF, score))
+        return rows
+
+
+def _key(user_id, score):
+    return -score << 32 | user_id
+
+
+def _load(kind, board_ids):
+    if kind == 'quiz':
+        query = db.select(Scores.quiz_id, Scores.user_id, Scores.total_scored).filter(Scores.quiz_id.in_(board_ids))
+    else:
+        query = db.select(UserSubjectScoreStats.subject_id, UserSubjectScoreStats.user_id,
+                          UserSubjectScoreStats.total_scored_sum).filter(UserSubjectScoreStats.subject_id.in_(board_ids))
+    entries = {board_id: [] for board_id in board_ids}
+    for board_id, user_id, score in db.session.execute(query):
+        entries[board_id].append((user_id, score))
+    return {board_id: RankedScores(board_entries) for board_id, board_entries in entries.items()}
+
+
+def rebuild_leaderboards():
+    """Load every quiz and subject board from the database, replacing what this process holds"""
+    entries = defaultdict(list)
+    for quiz_id, user_id, score in db.session.execute(
+        db.select(Scores.quiz_id, Scores.user_id, Scores.total_scored)
+    ):
+        entries[('quiz', quiz_id)].append((user_id, score))
+    for subject_id, user_id, total in db.session.execute(
+        db.select(UserSubjectScoreStats.subject_id, UserSubjectScoreStats.user_id,
+                  UserSubjectScoreStats.total_scored_sum)
+    ):
+        entries[('subject', subject_id)].append((user_id, total))
+    boards = {key: RankedScores(board_entries) for key, board_entries in entries.items()}
+    with _lock:
+        _boards.clear()
+        _boards.update(boards)
+
+
+def get_leaderboard(kind, board_id):
+    """The board of a quiz or subject, loaded from the database when missing or older than LEADERBOARD_TTL"""
+    return get_leaderboards(kind, [board_id])[board_id]
+
+
+def get_leaderboards(kind, board_ids):
+    """The boards of several quizzes or subjects as {id: RankedScores}, reloading the missing and expired ones in one query.
+
+    Only one request reloads a board at a time: the others keep serving the expired board
+    meanwhile, or wait for the load when there is no board yet.
+    """
+    now = time.monotonic()
+    boards = {}
+    expired = {}
+    with _lock:
+        for board_id in set(board_ids):
+            board = _boards.get((kind, board_id))
+            if board is not None and now - board.loaded_at <= LEADERBOARD_TTL:
+                boards[board_id] = board
+            else:
+                expired[board_id] = board
+                _load_locks.setdefault((kind, board_id), threading.Lock())
+
+    claimed, waiting = {}, {}
+    for board_id, board in expired.items():
+        load_lock = _load_locks[(kind, board_id)]
+        if load_lock.acquire(blocking=False):
+            claimed[board_id] = load_lock
+        elif board is not None:
+            boards[board_id] = board
+        else:
+            waiting[board_id] = load_lock
+    try:
+        if claimed:
+            boards.update(_reload(kind, list(claimed)))
+    finally:
+        for load_lock in claimed.values():
+            load_lock.release()
+
+    for load_lock in waiting.values():
+        with load_lock:  # Released once the other request stored its load
+            pass
+    if waiting:
+        boards.update(get_leaderboards(kind, list(waiting)))
+    return boards
+
+
+def _reload(kind, board_ids):
+    with _lock:
+        for board_id in board_ids:
+            _loading[(kind, board_id)] = []
+    try:
+        loaded = _load(kind, board_ids)
+    finally:
+        with _lock:
+            replays = {board_id: _loading.pop((kind, board_id)) for board_id in board_ids}
+    with _lock:
+        for board_id, board in loaded.items():
+            # The load may or may not have seen changes committed meanwhile; replaying them is a
+            # no-op for those it saw. A board forgotten meanwhile is returned but not kept.
+            replay = replays[board_id]
+            if any(user_id is None for user_id, _, _ in replay):
+                continue
+            for user_id, old_score, new_score in replay:
+                board.update(user_id, old_score, new_score)
+            _boards[(kind, board_id)] = board
+    return loaded
+
+
+def leaderboard_rows(kind, board_id, n=LEADERBOARD_TOP):
+    """The top n students of a board with their usernames"""
+    top = get_leaderboard(kind, board_id).top(n)
+    usernames = dict(db.session.execute(
+        db.select(User.id, User.username).filter(User.id.in_([user_id for _, user_id, _ in top]))
+    ).all()) if top else {}
+    return [LeaderboardRow(rank, user_id, usernames.get(user_id, ''), score) for rank, user_id, score in top]
+
+
+def record_leaderboard_change(kind, board_id, user_id, old_score, new_score):
+    """Queue a score change inside the caller's transaction; it reaches the boards when the transaction commits"""
+    db.session.info.setdefault('leaderboard_changes', []).append((kind, board_id, user_id, old_score, new_score))
+
+
+def forget_leaderboard(kind, board_id):
+    """Drop a board once the caller's transaction commits, so its next read reloads it"""
+    db.session.info.setdefault('leaderboard_changes', []).append((kind, board_id, None, None, None))
+
+
+@event.listens_for(db.session, 'after_commit')
+def _apply_changes(session):
+    changes = session.info.pop('leaderboard_changes', None)
+    if not changes:
+        return
+    with _lock:
+        for kind, board_id, user_id, old_score, new_score in changes:
+            loading = _loading.get((kind, board_id))
+            if loading is not None:
+                loading.append((user_id, old_score, new_score))
+            if user_id is None:
+                _boards.pop((kind, board_id), None)
+                continue
+            board = _boards.get((kind, board_id))
+            if board is not None:  # Boards not loaded yet come from the database with this change in them
+                board.update(user_id, old_score, new_score)
+
+
+@event.listens_for(db.session, 'after_rollback')
+def _discard_changes(session):
+    session.info.pop('leaderboard_changes', None)
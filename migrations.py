@@ -0,0 +1,102 @@
+from sqlalchemy import inspect, text
+from sqlalchemy.schema import AddConstraint, CreateTable
+from models import db
+from search_index import create_search_index
+
+
+def upgrade_schema(engine):
+    """Add nullable columns, indexes, unique constraints, ON DELETE actions and search tables missing from an existing database, in place and without data loss"""
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            columns = {column['name'] for column in inspect(conn).get_columns(table.name)}
+            for column in table.columns:
+                if column.name not in columns and column.nullable:
+                    conn.execute(text(
+                        f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column.type.compile(conn.dialect)}"
+                    ))
+    upgrade_foreign_keys(engine)
+    with engine.begin() as conn:
+        existing = {ix['name'] for ix in inspect(conn).get_indexes('scores')}
+        if 'uq_scores_user_quiz' not in existing:
+            # Older databases may hold several score rows per (user, quiz); keep the latest one
+            conn.execute(text(
+                "DELETE FROM scores WHERE id NOT IN "
+                "(SELECT MAX(id) FROM scores GROUP BY user_id, quiz_id)"
+            ))
+        for table in db.metadata.sorted_tables:
+            for index in table.indexes:
+                index.create(conn, checkfirst=True)
+    create_search_index(engine)
+
+
+def upgrade_foreign_keys(engine):
+    """Recreate the foreign keys whose ON DELETE action differs from the models.
+
+    SQLite cannot alter a constraint, so those tables are rebuilt: created under a new
+    name, copied, dropped and renamed, with foreign key enforcement off meanwhile. The
+    indexes and search triggers lost with the old table are recreated by upgrade_schema.
+    """
+    with engine.connect() as conn:
+        stale = {table: keys for table in db.metadata.sorted_tables if (keys := _stale_foreign_keys(conn, table))}
+        if not stale:
+            return
+        if conn.dialect.name != 'sqlite':
+            for table, keys in stale.items():
+                for name, constraint in keys:
+                    conn.execute(text(f"ALTER TABLE {table.name} DROP CONSTRAINT {name}"))
+                    conn.execute(AddConstraint(constraint))
+            conn.commit()
+            return
+        conn.exec_driver_sql("PRAGMA foreign_keys=OFF")  # Only takes effect outside a transaction
+        try:
+            for table in stale:
+                _rebuild_sqlite_table(conn, table)
+            _resolve_orphans(conn)
+            conn.commit()
+        finally:
+            conn.exec_driver_sql("PRAGMA foreign_keys=ON")
+
+
+def _stale_foreign_keys(conn, table):
+    """(reflected name, model constraint) of each foreign key of the table with a different ON DELETE action"""
+    reflected = {tuple(fk['constrained_columns']): fk for fk in inspect(conn).get_foreign_keys(table.name)}
+    stale = []
+    for constraint in table.foreign_key_constraints:
+        fk = reflected.get(tuple(constraint.column_keys))
+        if fk is None:
+            continue
+        wanted = (constraint.ondelete or '').upper()
+        actual = (fk['options'].get('ondelete') or '').upper()
+        if wanted != actual and {wanted, actual} != {'', 'NO ACTION'}:
+            stale.append((fk['name'], constraint))
+    return stale
+
+
+def _rebuild_sqlite_table(conn, table):
+    existing = {column['name'] for column in inspect(conn).get_columns(table.name)}
+    columns = ', '.join(column.name for column in table.columns if column.name in existing)
+    rebuilt = table.to_metadata(db.metadata, name=f"{table.name}_rebuild")
+    try:
+        conn.execute(CreateTable(rebuilt))
+    finally:
+        db.metadata.remove(rebuilt)
+    conn.exec_driver_sql(f"INSERT INTO {table.name}_rebuild ({columns}) SELECT {columns} FROM {table.name}")
+    conn.exec_driver_sql(f"DROP TABLE {table.name}")
+    conn.exec_driver_sql(f"ALTER TABLE {table.name}_rebuild RENAME TO {table.name}")
+
+
+def _resolve_orphans(conn):
+    """Apply the ON DELETE action to rows whose parent was deleted before the actions were enforced"""
+    tables = {table.name: table for table in db.metadata.sorted_tables}
+    for child, rowid, parent, _ in conn.exec_driver_sql("PRAGMA foreign_key_check").all():
+        if child not in tables:
+            continue
+        for constraint in tables[child].foreign_key_constraints:
+            if constraint.referred_table.name != parent:
+                continue
+            if constraint.ondelete == 'CASCADE':
+                conn.exec_driver_sql(f"DELETE FROM {child} WHERE rowid = ?", (rowid,))
+            elif constraint.ondelete == 'SET NULL':
+                assignments = ', '.join(f"{column} = NULL" for column in constraint.column_keys)
+                conn.exec_driver_sql(f"UPDATE {child} SET {assignments} WHERE rowid = ?", (rowid,))
+            break
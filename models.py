@@ -28,8 +28,8 @@ class Subject(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
-    chapters = db.relationship('Chapter', cascade="delete,all", backref='subject', lazy=True)
-    questions = db.relationship('Question', backref='subject', lazy=True)
+    chapters = db.relationship('Chapter', cascade="delete,all", backref='subject', lazy=True, passive_deletes=True)
+    questions = db.relationship('Question', backref='subject', lazy=True, passive_deletes=True)
     
 
 class Chapter(db.Model):
@@ -38,28 +38,29 @@ class Chapter(db.Model):
     name = db.Column(db.String(100), nullable=False)
     no_of_question = db.Column(db.Integer, nullable=False)
     description = db.Column(db.Text, nullable=False)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
-    quizzes = db.relationship('Quiz', cascade="delete,all", backref='chapter', lazy=True)
-    questions = db.relationship('Question', cascade="delete,all", backref='chapter', lazy=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), nullable=False, index=True)
+    quizzes = db.relationship('Quiz', cascade="delete,all", backref='chapter', lazy=True, passive_deletes=True)
+    questions = db.relationship('Question', cascade="delete,all", backref='chapter', lazy=True, passive_deletes=True)
 class Quiz(db.Model):
     __tablename__ = 'quizzes'
     id = db.Column(db.Integer, primary_key=True)
     quiz_name = db.Column(db.String(40), nullable=False)  # Removed primary_key=True
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id', ondelete='CASCADE'), nullable=False, index=True)
     no_of_question = db.Column(db.Integer, nullable=False)
     remarks = db.Column(db.Text, nullable=True)
+    question_pool = db.Column(db.String(10), nullable=True)  # None: fixed paper; 'quiz' / 'chapter': sampled per student
     # date = db.Column(db.DateTime, nullable=True)
-    # duration = db.Column(db.String(5), nullable=True)  # Format HH:MM
-    questions = db.relationship('Question',cascade="delete,all", backref='quiz', lazy=True)  # Updated backref to 'quiz'
-    scores = db.relationship('Scores', cascade="delete,all", backref='quiz', lazy=True)  # Renamed from 'quizs'
+    duration = db.Column(db.String(5), nullable=True)  # Format HH:MM; None means the quiz is untimed
+    questions = db.relationship('Question',cascade="delete,all", backref='quiz', lazy=True, passive_deletes=True)  # Updated backref to 'quiz'
+    scores = db.relationship('Scores', cascade="delete,all", backref='quiz', lazy=True, passive_deletes=True)  # Renamed from 'quizs'
 
     
 class Question(db.Model):
     __tablename__ = 'questions'  # Ensuring it's named properly as questions
     id = db.Column(db.Integer, primary_key=True)
-    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id'), nullable=False)
-    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id'), nullable=False)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)  # Fix quiz table name if needed
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), nullable=False)
+    chapter_id = db.Column(db.Integer, db.ForeignKey('chapters.id', ondelete='CASCADE'), nullable=False, index=True)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)  # Fix quiz table name if needed
     question_title = db.Column(db.Text, nullable=False)
     question_statement = db.Column(db.Text, nullable=False)
     option1 = db.Column(db.String(255), nullable=False)
@@ -67,14 +68,17 @@ class Question(db.Model):
     option3 = db.Column(db.String(255), nullable=False)
     option4 = db.Column(db.String(255), nullable=False)
     correct_option = db.Column(db.String(10), nullable=False)  # Store correct option as '1', '2', '3', '4', etc.
-    answers = db.relationship('Answer', backref='question', lazy='dynamic')  # this is where the conflict may happen
+    answers = db.relationship('Answer', cascade="delete,all", backref='question', lazy='dynamic', passive_deletes=True)  # this is where the conflict may happen
 
  
 
 class Scores(db.Model):
     __tablename__ = 'scores'
+    __table_args__ = (
+        db.Index('uq_scores_user_quiz', 'user_id', 'quiz_id', unique=True),  # One score row per (user, quiz)
+    )
     id = db.Column(db.Integer, primary_key=True)
-    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     # time_stamp_of_attempt = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     total_scored = db.Column(db.Integer, nullable=False, default=0)
@@ -83,8 +87,8 @@ class Scores(db.Model):
 class Answer(db.Model):
     __tablename__ = 'answers'  # Explicitly name the table
     id = db.Column(db.Integer, primary_key=True)
-    question_id = db.Column(db.Integer, db.ForeignKey('questions.id'), nullable=False)  # ✅ Fix reference
-    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)  # ✅ Fix reference
+    question_id = db.Column(db.Integer, db.ForeignKey('questions.id', ondelete='CASCADE'), nullable=False, index=True)  # ✅ Fix reference
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)  # ✅ Fix reference
     answer_text = db.Column(db.Text, nullable=False)
     selected_answer = db.Column(db.Text, nullable=False)
     is_correct = db.Column(db.Boolean, default=True)
@@ -96,4 +100,89 @@ class Answer(db.Model):
         self.answer_text = answer_text
         self.selected_answer=selected_answer
         self.is_correct = is_correct
-        
\ No newline at end of file
+        
+
+class CatalogVersion(db.Model):
+    __tablename__ = 'catalog_version'
+    id = db.Column(db.Integer, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)  # Bumped on every admin catalog change
+    updated_at = db.Column(db.DateTime, nullable=True)  # When it was last bumped; Last-Modified of the catalog API
+
+
+class SubjectScoreStats(db.Model):
+    __tablename__ = 'subject_score_stats'
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)  # Scores rows in this subject
+    total_scored_sum = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=True)
+    histogram = db.Column(db.JSON, nullable=False, default=dict)  # {"score": number of Scores rows}
+
+
+class UserSubjectScoreStats(db.Model):
+    __tablename__ = 'user_subject_score_stats'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    subject_id = db.Column(db.Integer, db.ForeignKey('subjects.id', ondelete='CASCADE'), primary_key=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_scored_sum = db.Column(db.Integer, nullable=False, default=0)
+    max_score = db.Column(db.Integer, nullable=True)
+    histogram = db.Column(db.JSON, nullable=False, default=dict)
+
+
+class PendingSubmission(db.Model):
+    __tablename__ = 'pending_submissions'
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False)
+    answers = db.Column(db.JSON, nullable=False)  # {"answers_<question_id>": "<option>"}
+    submitted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, nullable=True)  # Times grading this submission failed
+    failed_at = db.Column(db.DateTime, nullable=True)  # Set when it gave up; failed submissions are no longer claimed
+    error = db.Column(db.Text, nullable=True)  # The last grading error
+
+
+class QuizAttempt(db.Model):
+    __tablename__ = 'quiz_attempts'
+    __table_args__ = (
+        db.Index('uq_quiz_attempts_user_quiz', 'user_id', 'quiz_id', unique=True),  # The current attempt per (user, quiz)
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='CASCADE'), nullable=False, index=True)
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    deadline = db.Column(db.DateTime, nullable=False)
+    answers = db.Column(db.JSON, nullable=False, default=dict)  # Autosaved {"answers_<question_id>": "<option>"}
+    saved_at = db.Column(db.DateTime, nullable=True)
+    submitted_at = db.Column(db.DateTime, nullable=True)
+
+
+class Attempt(db.Model):
+    __tablename__ = 'attempts'  # Append-only history; Scores keeps only the latest score per (user, quiz)
+    __table_args__ = (
+        db.Index('ix_attempts_user_ts', 'user_id', 'attempted_at'),
+        db.Index('ix_attempts_quiz_ts', 'quiz_id', 'attempted_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    quiz_id = db.Column(db.Integer, db.ForeignKey('quizzes.id', ondelete='SET NULL'), nullable=True)  # History outlives the quiz
+    total_scored = db.Column(db.Integer, nullable=False)
+    attempted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+
+class AttemptBucket(db.Model):
+    __tablename__ = 'attempt_buckets'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    period = db.Column(db.String(5), primary_key=True)  # 'month' or 'week'
+    bucket_start = db.Column(db.Date, primary_key=True)  # First day of the month / Monday of the week
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    total_scored_sum = db.Column(db.Integer, nullable=False, default=0)
+
+
+class LoginFailure(db.Model):
+    __tablename__ = 'login_failures'  # Failed logins within LOGIN_WINDOW, shared by all worker processes
+    __table_args__ = (
+        db.Index('ix_login_failures_key', 'kind', 'key', 'failed_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(4), nullable=False)  # 'user' (username per address) or 'ip'
+    key = db.Column(db.String(255), nullable=False)
+    failed_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -0,0 +1,48 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+from operator import attrgetter
+from flask import current_app, request
+
+# prev_cursor / next_cursor are ids to pass back as ?before= / ?after=; None when there is no such page
+Page = namedtuple('Page', 'items per_page prev_cursor next_cursor')
+
+
+def page_args():
+    """Read ?after=, ?before= and ?per_page= from the request, clamping the page size to MAX_PAGE_SIZE"""
+    per_page = request.args.get('per_page', current_app.config['PAGE_SIZE'], type=int)
+    per_page = max(1, min(per_page, current_app.config['MAX_PAGE_SIZE']))
+    return request.args.get('after', type=int), request.args.get('before', type=int), per_page
+
+
+def keyset_page(query, column, after=None, before=None, per_page=20, key=attrgetter('id')):
+    """Fetch one page of a query by seeking on an indexed id column instead of using OFFSET"""
+    if before is not None:
+        rows = query.filter(column < before).order_by(column.desc()).limit(per_page + 1).all()
+        has_prev = len(rows) > per_page
+        rows = rows[:per_page][::-1]
+        return _page(rows, per_page, has_prev, True, key)
+
+    if after is not None:
+        query = query.filter(column > after)
+    rows = query.order_by(column).limit(per_page + 1).all()
+    has_next = len(rows) > per_page
+    return _page(rows[:per_page], per_page, after is not None, has_next, key)
+
+
+def keyset_slice(items, ids, after=None, before=None, per_page=20):
+    """Same as keyset_page for an in-memory sequence sorted by id, using binary search on ids"""
+    if before is not None:
+        end = bisect_left(ids, before)
+        start = max(end - per_page, 0)
+        return _page(items[start:end], per_page, start > 0, True, None, ids[start:end])
+
+    start = bisect_right(ids, after) if after is not None else 0
+    end = start + per_page
+    return _page(items[start:end], per_page, start > 0, end < len(items), None, ids[start:end])
+
+
+def _page(rows, per_page, has_prev, has_next, key, keys=None):
+    if not rows:
+        return Page(rows, per_page, None, None)
+    keys = keys or [key(rows[0]), key(rows[-1])]
+    return Page(rows, per_page, keys[0] if has_prev else None, keys[-1] if has_next else None)
@@ -0,0 +1,91 @@
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+from models import db, LoginFailure
+
+
+class PasswordHashBusy(Exception):
+    """Too many password hashes are already running or waiting"""
+
+
+class PasswordHasher:
+    """Runs password hashing on a bounded thread pool.
+
+    hashlib releases the GIL while it hashes, so at most `workers` hashes burn CPU at once
+    while other requests keep being served; beyond `workers + queue` callers are turned
+    away with PasswordHashBusy instead of piling up.
+    """
+
+    def __init__(self, workers, queue):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+        self._slots = threading.BoundedSemaphore(workers + queue)
+        self._prefixes = {}  # configured method -> method prefix as stored in hashes
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, current_app.config['PASSWORD_HASH_METHOD'])
+
+    def verify(self, user, password):
+        """Check a password; on success re-hash it inside the caller's transaction if the configured method changed"""
+        if not self._run(check_password_hash, user.password, password):
+            return False
+        if self.needs_rehash(user.password):
+            user.password = self.hash(password)
+        return True
+
+    def needs_rehash(self, stored_hash):
+        method = current_app.config['PASSWORD_HASH_METHOD']
+        prefix = self._prefixes.get(method)
+        if prefix is None:
+            # Werkzeug fills in default parameters ("pbkdf2:sha256" -> "pbkdf2:sha256:1000000"); learn them once
+            prefix = self._prefixes[method] = generate_password_hash('', method).split('$', 1)[0]
+        return stored_hash.split('$', 1)[0] != prefix
+
+    def _run(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHashBusy()
+        try:
+            return self._executor.submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+
+class LoginLimiter:
+    """Sliding-window count of failed logins per (username, client address) and per client address.
+
+    Counting a username per address throttles guessing without letting anyone lock
+    another student out of their account by failing to log in as them. The failures are
+    rows in login_failures, so the limits hold across all worker processes together.
+    """
+
+    def __init__(self, window, max_failures, max_failures_per_ip):
+        self.window = window
+        self.limits = {'user': max_failures, 'ip': max_failures_per_ip}
+
+    def keys(self, username, address):
+        address = address or ''
+        return [('user', f"{address}/{username.strip().lower()}"[:255]), ('ip', address)]
+
+    def is_blocked(self, keys):
+        """True when any key reached its limit within the window; checked before any hash is computed"""
+        counts = db.session.execute(
+            db.select(LoginFailure.kind, LoginFailure.key, db.func.count())
+            .filter(db.tuple_(LoginFailure.kind, LoginFailure.key).in_(keys), LoginFailure.failed_at >= self._cutoff())
+            .group_by(LoginFailure.kind, LoginFailure.key)
+        ).all()
+        return any(count >= self.limits[kind] for kind, _, count in counts)
+
+    def record_failure(self, keys):
+        """Count a failure inside the caller's transaction, dropping failures that left the window"""
+        db.session.execute(db.delete(LoginFailure).filter(LoginFailure.failed_at < self._cutoff()))
+        now = datetime.utcnow()
+        db.session.execute(db.insert(LoginFailure), [{'kind': kind, 'key': key, 'failed_at': now} for kind, key in keys])
+
+    def reset(self, key):
+        """Forget a key's failures inside the caller's transaction"""
+        kind, value = key
+        db.session.execute(db.delete(LoginFailure).filter_by(kind=kind, key=value))
+
+    def _cutoff(self):
+        return datetime.utcnow() - timedelta(seconds=self.window)
@@ -0,0 +1,145 @@
+import cProfile
+import logging
+import os
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from flask import g, has_request_context, request
+from sqlalchemy import event
+
+# Upper bounds in seconds of the request duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+log = logging.getLogger(__name__)
+
+
+class RequestProfile:
+    """What one request spent, collected on flask.g"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.statements = Counter()  # SQL text -> executions; SQLAlchemy binds parameters, so the text is the shape
+        self.sql_time = 0.0
+        self.profiler = None
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.duration_sum = 0.0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.statements = 0
+        self.sql_time = 0.0
+        self.n_plus_one = 0
+
+
+_metrics = defaultdict(EndpointMetrics)  # endpoint -> totals since the process started
+_lock = threading.Lock()
+# Held by the one request being cProfiled: a process runs one profiler at a time (Python 3.12+
+# refuses a second), so concurrent requests on other threads go unprofiled
+_profiler_lock = threading.Lock()
+
+
+def init_profiling(app, engine):
+    """Time every request and its SQL statements; metrics are per process and read through render_metrics()"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+    app.before_request(lambda: _start_request(app))
+    app.teardown_request(lambda exc: _finish_request(app))
+
+
+def _start_request(app):
+    g.profile = RequestProfile()
+    # cProfile only runs when slow requests are to be dumped, sampling one request at a time
+    if app.config['SLOW_REQUEST_MS'] and _profiler_lock.acquire(blocking=False):
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # Another profiling tool, e.g. a debugger or coverage, is active
+            _profiler_lock.release()
+            return
+        g.profile.profiler = profiler
+
+
+def _finish_request(app):
+    profile = g.pop('profile', None)
+    if profile is None:
+        return
+    if profile.profiler is not None:
+        profile.profiler.disable()
+        _profiler_lock.release()
+    duration = time.perf_counter() - profile.started
+    endpoint = request.endpoint or 'unmatched'
+
+    repeated = {sql: count for sql, count in profile.statements.items()
+                if count > app.config['N_PLUS_ONE_THRESHOLD']}
+    for sql, count in repeated.items():
+        log.warning("Possible N+1 in %s: statement ran %d times: %s", endpoint, count, ' '.join(sql.split()))
+
+    with _lock:
+        metrics = _metrics[endpoint]
+        metrics.requests += 1
+        metrics.duration_sum += duration
+        for i, bound in enumerate(DURATION_BUCKETS):
+            if duration <= bound:
+                metrics.buckets[i] += 1
+        metrics.statements += sum(profile.statements.values())
+        metrics.sql_time += profile.sql_time
+        metrics.n_plus_one += bool(repeated)
+
+    if profile.profiler is not None and duration * 1000 >= app.config['SLOW_REQUEST_MS']:
+        os.makedirs(app.config['PROFILE_DIR'], exist_ok=True)
+        path = os.path.join(app.config['PROFILE_DIR'],
+                            f"{datetime.utcnow():%Y%m%dT%H%M%S%f}-{endpoint}.prof")
+        profile.profiler.dump_stats(path)
+        log.warning("Slow request %s took %.0f ms, profile written to %s", endpoint, duration * 1000, path)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and 'profile' in g:
+        conn.info.setdefault('profile_started', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('profile_started')
+    if not started or not has_request_context() or 'profile' not in g:
+        return
+    g.profile.sql_time += time.perf_counter() - started.pop()
+    g.profile.statements[statement] += 1
+
+
+def render_metrics():
+    """The collected metrics in the Prometheus text exposition format"""
+    with _lock:
+        snapshot = sorted((endpoint, vars(metrics).copy()) for endpoint, metrics in _metrics.items())
+
+    lines = [
+        "# HELP quiz_request_duration_seconds Wall time of requests by endpoint",
+        "# TYPE quiz_request_duration_seconds histogram",
+    ]
+    for endpoint, metrics in snapshot:
+        label = _label(endpoint)
+        for bound, count in zip(DURATION_BUCKETS, metrics['buckets']):
+            lines.append(f'quiz_request_duration_seconds_bucket{{endpoint="{label}",le="{bound}"}} {count}')
+        lines.append(f'quiz_request_duration_seconds_bucket{{endpoint="{label}",le="+Inf"}} {metrics["requests"]}')
+        lines.append(f'quiz_request_duration_seconds_sum{{endpoint="{label}"}} {metrics["duration_sum"]:.6f}')
+        lines.append(f'quiz_request_duration_seconds_count{{endpoint="{label}"}} {metrics["requests"]}')
+
+    for name, key, kind, help_text in (
+        ('quiz_sql_statements_total', 'statements', 'counter', "SQL statements executed by requests"),
+        ('quiz_sql_duration_seconds_total', 'sql_time', 'counter', "Time requests spent in SQL statements"),
+        ('quiz_n_plus_one_requests_total', 'n_plus_one', 'counter',
+         "Requests that repeated one statement more than N_PLUS_ONE_THRESHOLD times"),
+    ):
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for endpoint, metrics in snapshot:
+            value = metrics[key]
+            value = f"{value:.6f}" if isinstance(value, float) else value
+            lines.append(f'{name}{{endpoint="{_label(endpoint)}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+def _label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
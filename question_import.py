@@ -0,0 +1,105 @@
+import csv
+import json
+from collections import namedtuple
+from models import db, Question
+from catalog import get_catalog, bump_catalog_version
+
+IMPORT_BATCH_SIZE = 500  # Rows per executemany
+OPTION_MAX_LENGTH = 255  # Question.option1..option4 are String(255)
+REQUIRED_FIELDS = ('quiz_id', 'question_title', 'question_statement',
+                   'option1', 'option2', 'option3', 'option4', 'correct_option')
+
+ImportResult = namedtuple('ImportResult', 'imported rejected')
+
+
+def iter_rows(lines, fmt):
+    """Yield (line number, row dict) from a CSV or JSONL text stream without reading it all into memory"""
+    if fmt == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            yield reader.line_num, row
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_no, ValueError(f"invalid JSON: {e}")
+                continue
+            yield line_no, row if isinstance(row, dict) else ValueError("expected a JSON object")
+    else:
+        raise ValueError(f"unsupported format {fmt!r}, expected csv or jsonl")
+
+
+def validate_row(row, catalog):
+    """Check one row against the Question model and the catalog; return the column values to insert"""
+    if isinstance(row, Exception):
+        raise row
+    values = {field: str(row.get(field) if row.get(field) is not None else '').strip() for field in REQUIRED_FIELDS}
+    missing = [field for field, value in values.items() if not value]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+    quiz = catalog.quizzes.get(_to_int(values['quiz_id'], 'quiz_id'))
+    if quiz is None:
+        raise ValueError(f"quiz {values['quiz_id']} does not exist")
+    chapter = catalog.chapters[quiz.chapter_id]
+    for field, expected in (('chapter_id', chapter.id), ('subject_id', chapter.subject_id)):
+        given = row.get(field)
+        if given not in (None, '') and _to_int(given, field) != expected:
+            raise ValueError(f"{field} {given} does not match quiz {quiz.id} ({field} {expected})")
+
+    if values['correct_option'] not in ('1', '2', '3', '4'):
+        raise ValueError(f"correct_option must be 1-4, got {values['correct_option']!r}")
+    for field in ('option1', 'option2', 'option3', 'option4'):
+        if len(values[field]) > OPTION_MAX_LENGTH:
+            raise ValueError(f"{field} is longer than {OPTION_MAX_LENGTH} characters")
+
+    values.update(quiz_id=quiz.id, chapter_id=chapter.id, subject_id=chapter.subject_id)
+    return values
+
+
+def import_questions(lines, fmt, on_error, dry_run=False):
+    """Validate and insert questions row by row in batched executemany chunks, committing once at the end.
+
+    on_error(line_no, message) is called for every rejected row; valid rows are still imported.
+    """
+    catalog = get_catalog()
+    imported = rejected = 0
+    batch = []
+    try:
+        for line_no, row in iter_rows(lines, fmt):
+            try:
+                batch.append(validate_row(row, catalog))
+            except ValueError as e:
+                rejected += 1
+                on_error(line_no, str(e))
+                continue
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                imported += _flush(batch, dry_run)
+        imported += _flush(batch, dry_run)
+        if dry_run or not imported:
+            db.session.rollback()
+        else:
+            bump_catalog_version()
+            db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return ImportResult(imported, rejected)
+
+
+def _flush(batch, dry_run):
+    count = len(batch)
+    if batch and not dry_run:
+        db.session.execute(db.insert(Question), batch)
+    batch.clear()
+    return count
+
+
+def _to_int(value, field):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be an integer, got {value!r}")
@@ -0,0 +1,49 @@
+import random
+from flask import current_app
+from catalog import get_quiz_questions, get_pool_question_ids, get_pool_questions
+
+# Quiz.question_pool values; a quiz without one gives every student all of its questions in order
+QUESTION_POOLS = {'quiz': "Random questions from this quiz", 'chapter': "Random questions from the whole chapter"}
+OPTION_VALUES = (1, 2, 3, 4)
+
+
+def paper_rng(quiz_id, user_id):
+    """Deterministic generator for a (user, quiz) pair, so a student sees the same paper on reload and at grading"""
+    return random.Random(f"{current_app.config['SECRET_KEY']}:{quiz_id}:{user_id}")
+
+
+def draw_paper(catalog, quiz, user_id):
+    """Sample a student's paper from the quiz's question pool.
+
+    Returns the quiz node with its questions replaced by the sample and a
+    question_id -> option order mapping. Option values keep their original
+    numbers, so grading compares them with correct_option unchanged.
+    """
+    pool = get_pool_question_ids(catalog, quiz)
+    k = min(quiz.no_of_question or len(pool), len(pool))
+    rng = paper_rng(quiz.id, user_id)
+    question_ids = rng.sample(pool, k)  # random.sample is O(k) on a sequence, the pool is never copied
+    option_orders = {question_id: tuple(rng.sample(OPTION_VALUES, len(OPTION_VALUES))) for question_id in question_ids}
+    return quiz._replace(questions=get_pool_questions(catalog, quiz, question_ids)), option_orders
+
+
+def paper_answer_key(quiz):
+    return tuple((question.id, str(question.correct_option)) for question in quiz.questions)
+
+
+def graded_paper(catalog, quiz, user_id):
+    """Return the (quiz, answer key) a student's submission is graded against"""
+    if quiz.question_pool:
+        quiz, _ = draw_paper(catalog, quiz, user_id)  # The student's own paper
+        return quiz, paper_answer_key(quiz)
+    return get_quiz_questions(catalog, quiz)
+
+
+def submitted_answers(answer_key, form):
+    """Keep only valid options chosen for the questions on the student's paper"""
+    answers = {}
+    for question_id, _ in answer_key:
+        answer = form.get(f"answers_{question_id}")
+        if answer in ('1', '2', '3', '4'):
+            answers[f"answers_{question_id}"] = answer
+    return answers
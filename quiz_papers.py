@@ -0,0 +1,67 @@
+import hashlib
+import threading
+from collections import OrderedDict, namedtuple
+from flask import abort, current_app, render_template
+from catalog import get_catalog, get_quiz_questions
+from question_sets import draw_paper
+from attempts import convert_duration_to_seconds
+
+QUIZ_PAPER_CACHE_SIZE = 256  # Rendered quiz papers kept per process
+
+QuizPaper = namedtuple('QuizPaper', 'html etag time_limit')  # time_limit in seconds, None when untimed
+
+_papers = OrderedDict()  # (quiz_id, catalog version) -> QuizPaper
+_lock = threading.Lock()
+_rendering = {}  # (quiz_id, catalog version) -> lock held while that paper renders
+
+
+def get_quiz_paper(quiz_id, user_id=None):
+    """Return the rendered question paper for a quiz, rendering it once per catalog version.
+
+    A fixed paper is the same for every student, and every admin change to a quiz or its
+    questions bumps the catalog version, so (quiz_id, version) identifies its content.
+    Randomized papers are drawn for user_id and rendered per request.
+    Returns None when the quiz does not exist.
+    """
+    catalog = get_catalog()
+    quiz = catalog.quizzes.get(quiz_id)
+    if quiz is None:
+        return None
+    if quiz.question_pool:
+        if user_id is None:
+            abort(current_app.login_manager.unauthorized())
+        return _render(*draw_paper(catalog, quiz, user_id))
+
+    key = (quiz_id, catalog.version)
+    paper = _cached(key)
+    if paper is not None:
+        return paper
+
+    # Students opening a quiz together wait for one render instead of each rendering it;
+    # renders of other papers go ahead in parallel
+    with _lock:
+        render_lock = _rendering.setdefault(key, threading.Lock())
+    with render_lock:
+        paper = _cached(key)
+        if paper is None:
+            paper = _render(get_quiz_questions(catalog, quiz).quiz)
+            with _lock:
+                _papers[key] = paper
+                while len(_papers) > QUIZ_PAPER_CACHE_SIZE:
+                    _papers.popitem(last=False)
+                _rendering.pop(key, None)
+    return paper
+
+
+def _render(quiz, option_orders=None):
+    time_limit = convert_duration_to_seconds(quiz.duration) if quiz.duration else None
+    html = render_template('quiz_questions.html', quiz=quiz, option_orders=option_orders or {}, time_limit=time_limit)
+    return QuizPaper(html, hashlib.sha256(html.encode()).hexdigest()[:32], time_limit)
+
+
+def _cached(key):
+    with _lock:
+        paper = _papers.get(key)
+        if paper is not None:
+            _papers.move_to_end(key)
+        return paper
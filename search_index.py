@@ -0,0 +1,123 @@
+import re
+from collections import namedtuple
+from sqlalchemy import literal, text, union_all
+from models import db
+
+# content table -> (indexed columns, bm25 weight per column, column shown as the result title)
+SEARCH_SOURCES = {
+    'subjects': (('name', 'description'), (10.0, 1.0), 'name'),
+    'chapters': (('name', 'description'), (10.0, 1.0), 'name'),
+    'quizzes': (('quiz_name', 'remarks'), (10.0, 1.0), 'quiz_name'),
+    'questions': (('question_title', 'question_statement'), (5.0, 1.0), 'question_title'),
+}
+
+SearchHit = namedtuple('SearchHit', 'kind id title snippet rank')
+SearchPage = namedtuple('SearchPage', 'hits page per_page has_next')
+
+
+def create_search_index(engine):
+    """Create the FTS5 external-content tables and the triggers that keep them in sync with their content tables"""
+    if engine.dialect.name != 'sqlite':
+        return
+    with engine.begin() as conn:
+        for table, (columns, _, _) in SEARCH_SOURCES.items():
+            fts = f"{table}_fts"
+            cols = ', '.join(columns)
+            new_cols = ', '.join(f"new.{c}" for c in columns)
+            old_cols = ', '.join(f"old.{c}" for c in columns)
+            exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = :n"), {'n': fts}).first()
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            if not exists:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+
+
+def search_enabled():
+    """The FTS5 index only exists on SQLite; other databases fall back to ilike scans"""
+    return db.engine.dialect.name == 'sqlite'
+
+
+def match_query(search_txt):
+    """Turn free text into an FTS5 query where every word must match as a prefix"""
+    words = re.findall(r"\w+", search_txt or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def matching_ids(table, search_txt):
+    """Ids of the rows of one content table matching the text, best match first"""
+    query = match_query(search_txt)
+    if not query:
+        return []
+    _, weights, _ = SEARCH_SOURCES[table]
+    fts = f"{table}_fts"
+    return db.session.execute(text(
+        f"SELECT rowid FROM {fts} WHERE {fts} MATCH :q ORDER BY bm25({fts}, {', '.join(map(str, weights))})"
+    ), {'q': query}).scalars().all()
+
+
+def search_catalog(search_txt, kinds=None, page=1, per_page=20):
+    """Ranked prefix search over subjects, chapters, quizzes and questions"""
+    query = match_query(search_txt)
+    page = max(page, 1)
+    if not query:
+        return SearchPage([], page, per_page, False)
+    if not search_enabled():
+        return _ilike_search(search_txt, kinds, page, per_page)
+
+    selects = []
+    for table, (_, weights, title) in SEARCH_SOURCES.items():
+        if kinds and table not in kinds:
+            continue
+        fts = f"{table}_fts"
+        selects.append(
+            f"SELECT '{table}' AS kind, rowid AS id, {title} AS title, "
+            f"snippet({fts}, -1, '[', ']', '…', 12) AS snippet, "
+            f"bm25({fts}, {', '.join(map(str, weights))}) AS rank "
+            f"FROM {fts} WHERE {fts} MATCH :q"
+        )
+    if not selects:
+        return SearchPage([], page, per_page, False)
+
+    rows = db.session.execute(text(
+        ' UNION ALL '.join(selects) + " ORDER BY rank LIMIT :limit OFFSET :offset"
+    ), {'q': query, 'limit': per_page + 1, 'offset': (page - 1) * per_page}).all()
+    hits = [SearchHit(*row) for row in rows[:per_page]]
+    return SearchPage(hits, page, per_page, len(rows) > per_page)
+
+
+def _ilike_search(search_txt, kinds, page, per_page):
+    """The same search without an FTS index: every word must appear in one of the indexed columns, unranked"""
+    words = re.findall(r"\w+", search_txt)
+    selects = []
+    for table, (columns, _, title) in SEARCH_SOURCES.items():
+        if kinds and table not in kinds:
+            continue
+        content = db.metadata.tables[table]
+        selects.append(db.select(
+            literal(table).label('kind'), content.c.id.label('id'), content.c[title].label('title'),
+            content.c[title].label('snippet'), literal(0.0).label('rank')
+        ).filter(*(db.or_(*(content.c[column].ilike(f"%{word}%") for column in columns)) for word in words)))
+    if not selects:
+        return SearchPage([], page, per_page, False)
+
+    rows = db.session.execute(
+        union_all(*selects).order_by('kind', 'id').limit(per_page + 1).offset((page - 1) * per_page)
+    ).all()
+    hits = [SearchHit(*row) for row in rows[:per_page]]
+    return SearchPage(hits, page, per_page, len(rows) > per_page)
@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from collections import namedtuple
+from flask import current_app
+from models import db, PendingSubmission
+from catalog import get_catalog
+from grading import apply_submission, grade_submission
+from question_sets import graded_paper, submitted_answers
+from attempts import finish_attempt
+
+SUBMISSION_BATCH_SIZE = 200  # Queued submissions graded per transaction
+SUBMISSION_IDLE_WAIT = 1.0  # Seconds the writer waits for new work when the queue is empty
+SUBMISSION_RETRY_WAIT = 5.0  # Seconds before retrying after a failed batch
+SUBMISSION_MAX_ATTEMPTS = 3  # Times a submission that fails to grade is retried before it is set aside as failed
+
+# The student's paper and either its GradeResult or, when queued, the id of the pending submission
+AcceptedSubmission = namedtuple('AcceptedSubmission', 'quiz result submission_id')
+
+log = logging.getLogger(__name__)
+
+_wakeup = threading.Event()
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def accept_submission(catalog, quiz, user_id, form):
+    """Grade a submitted paper, or queue it when SUBMISSION_QUEUE is on; None when a timed quiz was never started"""
+    subject_id = catalog.chapters[quiz.chapter_id].subject_id
+    quiz, answer_key = graded_paper(catalog, quiz, user_id)  # Grade against the student's own paper
+    if quiz.duration:
+        form = finish_attempt(quiz.id, user_id, form)  # Late submissions are graded on the autosaved answers
+        if form is None:
+            return None
+    if current_app.config['SUBMISSION_QUEUE']:
+        # Acknowledge at once; the background writer grades queued submissions in batches
+        submission_id = enqueue_submission(quiz, user_id, answer_key, form)
+        start_submission_writer(current_app._get_current_object())
+        return AcceptedSubmission(quiz, None, submission_id)
+    return AcceptedSubmission(quiz, grade_submission(quiz, subject_id, user_id, answer_key, form), None)
+
+
+def enqueue_submission(quiz, user_id, answer_key, form):
+    """Durably queue a submission and return its id; only answers to the student's own questions are kept"""
+    submission = PendingSubmission(user_id=user_id, quiz_id=quiz.id, answers=submitted_answers(answer_key, form))
+    db.session.add(submission)
+    db.session.commit()
+    _wakeup.set()
+    return submission.id
+
+
+def drain_submissions(limit=SUBMISSION_BATCH_SIZE):
+    """Grade up to limit queued submissions in one transaction and return how many were taken off the queue.
+
+    The queued rows are deleted in the same transaction that writes their answers and
+    scores, so after a crash every submission is either fully graded or still queued.
+    Each submission is graded inside its own SAVEPOINT: one that fails is rolled back
+    alone and put back on the queue, and after SUBMISSION_MAX_ATTEMPTS failures it is
+    kept as failed instead, so it cannot hold up the submissions behind it.
+    """
+    try:
+        rows = sorted(_claim(limit))
+        if not rows:
+            return 0
+        catalog = get_catalog()
+        for row in rows:
+            quiz = catalog.quizzes.get(row.quiz_id)
+            if quiz is None:
+                log.warning("Dropping submission %s: quiz %s no longer exists", row.id, row.quiz_id)
+                continue
+            queued_changes = len(db.session.info.get('leaderboard_changes', ()))
+            try:
+                with db.session.begin_nested():
+                    quiz, answer_key = graded_paper(catalog, quiz, row.user_id)
+                    apply_submission(quiz, catalog.chapters[quiz.chapter_id].subject_id, row.user_id, answer_key,
+                                     row.answers, attempted_at=row.submitted_at)
+            except Exception as error:
+                del db.session.info.setdefault('leaderboard_changes', [])[queued_changes:]  # Its scores were rolled back
+                _requeue(row, error)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(rows)
+
+
+def _requeue(row, error):
+    attempts = (row.attempts or 0) + 1
+    failed = attempts >= SUBMISSION_MAX_ATTEMPTS
+    log.error("Grading submission %s failed (attempt %d)%s: %r", row.id, attempts,
+              ", giving up" if failed else "", error)
+    db.session.execute(db.insert(PendingSubmission).values(
+        id=row.id, user_id=row.user_id, quiz_id=row.quiz_id, answers=row.answers, submitted_at=row.submitted_at,
+        attempts=attempts, failed_at=datetime.utcnow() if failed else None, error=repr(error)
+    ))
+
+
+def _claim(limit):
+    columns = (PendingSubmission.id, PendingSubmission.user_id, PendingSubmission.quiz_id, PendingSubmission.answers,
+               PendingSubmission.submitted_at, PendingSubmission.attempts)
+    queued = db.select(PendingSubmission.id).filter(PendingSubmission.failed_at.is_(None)) \
+        .order_by(PendingSubmission.id).limit(limit)
+    if db.session.get_bind().dialect.delete_returning:
+        # Taking the write lock with the DELETE keeps concurrent writers from grading the same rows
+        return db.session.execute(
+            db.delete(PendingSubmission).where(PendingSubmission.id.in_(queued.scalar_subquery()))
+            .returning(*columns),
+            execution_options={'synchronize_session': False}
+        ).all()
+    rows = db.session.execute(
+        db.select(*columns).filter(PendingSubmission.failed_at.is_(None))
+        .order_by(PendingSubmission.id).limit(limit).with_for_update()
+    ).all()
+    if rows:
+        db.session.execute(
+            db.delete(PendingSubmission).where(PendingSubmission.id.in_([row.id for row in rows])),
+            execution_options={'synchronize_session': False}
+        )
+    return rows
+
+
+def submission_state(submission_id, user_id):
+    """'queued' or 'failed' while the submission is on the queue, None once it was graded"""
+    row = db.session.execute(
+        db.select(PendingSubmission.failed_at).filter_by(id=submission_id, user_id=user_id)
+    ).first()
+    if row is None:
+        return None
+    return 'queued' if row.failed_at is None else 'failed'
+
+
+def start_submission_writer(app):
+    """Start this process's background writer if it is not running; it first drains anything left by a crash"""
+    global _writer
+    with _writer_lock:
+        if _writer is None or not _writer.is_alive():
+            _writer = threading.Thread(target=_run_writer, args=(app,), name='submission-writer', daemon=True)
+            _writer.start()
+
+
+def _run_writer(app):
+    while True:
+        _wakeup.clear()
+        try:
+            with app.app_context():
+                while drain_submissions():
+                    pass
+        except Exception:
+            log.exception("Grading queued submissions failed, retrying")
+            time.sleep(SUBMISSION_RETRY_WAIT)
+            continue
+        _wakeup.wait(SUBMISSION_IDLE_WAIT)
@@ -0,0 +1,78 @@
+import itertools
+import os
+import sys
+import tempfile
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# app.py reads its settings at import time, so point it at a scratch database first
+_tmp = tempfile.TemporaryDirectory()
+os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(_tmp.name, 'test.sqlite')
+
+_names = itertools.count(1)  # Keeps names unique across tests sharing the database
+
+
+@pytest.fixture(scope='session')
+def app():
+    from app import app, init_database
+    with app.app_context():
+        init_database()
+    return app
+
+
+@pytest.fixture
+def db(app):
+    """The database inside an application context; tests add their own rows next to other tests' rows"""
+    from models import db
+    with app.app_context():
+        yield db
+        db.session.remove()
+
+
+@pytest.fixture
+def make_quiz(db):
+    """Create a subject -> chapter -> quiz with n questions (correct option '1') and return the quiz"""
+    from models import Subject, Chapter, Quiz, Question
+    from catalog import bump_catalog_version
+
+    def make(n_questions=3, chapter=None):
+        n = next(_names)
+        if chapter is None:
+            subject = Subject(name=f"subject {n}", description='test')
+            db.session.add(subject)
+            db.session.flush()
+            chapter = Chapter(name=f"chapter {subject.id}", no_of_question=1, description='test',
+                              subject_id=subject.id)
+            db.session.add(chapter)
+            db.session.flush()
+        quiz = Quiz(quiz_name=f"quiz {n}", chapter_id=chapter.id, no_of_question=n_questions)
+        db.session.add(quiz)
+        db.session.flush()
+        for i in range(n_questions):
+            db.session.add(Question(subject_id=chapter.subject_id, chapter_id=chapter.id, quiz_id=quiz.id,
+                                    question_title=f"q{i}", question_statement='?', option1='a', option2='b',
+                                    option3='c', option4='d', correct_option='1'))
+        bump_catalog_version()
+        db.session.commit()
+        return quiz
+
+    return make
+
+
+@pytest.fixture
+def make_user(db):
+    """Create a student with password 'pw' (hashed cheaply) and return their id"""
+    from werkzeug.security import generate_password_hash
+    from models import User
+
+    def make():
+        name = f"student{next(_names)}"
+        user = User(username=name, email=f"{name}@example.com", full_name='test', qualification='test', role=1,
+                    password=generate_password_hash('pw', method='pbkdf2:sha256:1000'))
+        db.session.add(user)
+        db.session.commit()
+        return user.id
+
+    return make
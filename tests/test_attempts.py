@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from attempts import QUIZ_DEADLINE_GRACE, autosave, finish_attempt, flush_autosaves, start_attempt
+from models import QuizAttempt
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Another worker process autosaving the student's answers, then its flusher writing them
+_OTHER_WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from app import app
+from attempts import autosave, flush_autosaves
+with app.app_context():
+    if not autosave({quiz_id}, {user_id}, {answers!r}):
+        sys.exit(3)
+    flush_autosaves()
+"""
+
+
+def autosave_elsewhere(quiz_id, user_id, answers):
+    script = _OTHER_WORKER.format(root=ROOT, quiz_id=quiz_id, user_id=user_id, answers=answers)
+    return subprocess.run([sys.executable, '-c', script], env=os.environ).returncode == 0
+
+
+def move_deadline(db, quiz_id, user_id, seconds_from_now):
+    attempt = QuizAttempt.query.filter_by(user_id=user_id, quiz_id=quiz_id).one()
+    attempt.deadline = datetime.utcnow() + timedelta(seconds=seconds_from_now)
+    db.session.commit()
+
+
+def test_a_late_submit_grades_answers_autosaved_by_another_worker(db, make_quiz, make_user):
+    quiz, user_id = make_quiz(), make_user()
+    start_attempt(quiz.id, user_id, 600)
+    assert autosave(quiz.id, user_id, {'answers_1': '1'})
+    assert autosave_elsewhere(quiz.id, user_id, {'answers_1': '2', 'answers_2': '3'})
+
+    move_deadline(db, quiz.id, user_id, -QUIZ_DEADLINE_GRACE - 5)
+    assert finish_attempt(quiz.id, user_id, {'answers_1': '4'}) == {'answers_1': '2', 'answers_2': '3'}
+    db.session.commit()
+    assert not autosave(quiz.id, user_id, {'answers_1': '1'})  # Submitted attempts take no more autosaves
+
+
+def test_autosaves_follow_the_attempt_row_not_the_process(db, make_quiz, make_user):
+    quiz, user_id = make_quiz(), make_user()
+    start_attempt(quiz.id, user_id, 600)
+    move_deadline(db, quiz.id, user_id, -QUIZ_DEADLINE_GRACE - 5)
+    assert not autosave(quiz.id, user_id, {'answers_1': '1'})
+
+    start_attempt(quiz.id, user_id, 600)  # Restarted, possibly by another worker
+    assert autosave(quiz.id, user_id, {'answers_1': '1'})
+    assert autosave_elsewhere(quiz.id, user_id, {'answers_1': '2'})
+
+
+def test_buffered_autosaves_are_written_in_one_statement(db, make_quiz, make_user):
+    flush_autosaves()  # Whatever earlier tests left buffered
+    quiz = make_quiz()
+    user_ids = [make_user() for _ in range(3)]
+    for user_id in user_ids:
+        start_attempt(quiz.id, user_id, 600)
+        for option in '1234':
+            assert autosave(quiz.id, user_id, {'answers_1': option})
+    db.session.commit()
+
+    updates = []
+    listener = lambda conn, cursor, statement, *args: updates.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        assert flush_autosaves() == 3
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(updates) == 1  # One executemany UPDATE for every buffered attempt
+    assert all(a.answers == {'answers_1': '4'} for a in QuizAttempt.query.filter(QuizAttempt.user_id.in_(user_ids)))
+
+
+def test_a_flush_from_a_slower_worker_keeps_newer_answers(db, make_quiz, make_user):
+    quiz, user_id = make_quiz(), make_user()
+    start_attempt(quiz.id, user_id, 600)
+    assert autosave(quiz.id, user_id, {'answers_1': '1'})  # Buffered here, not yet written
+    assert autosave_elsewhere(quiz.id, user_id, {'answers_1': '2'})  # Later, and written first
+    db.session.commit()
+    flush_autosaves()
+    db.session.expire_all()
+    assert QuizAttempt.query.filter_by(user_id=user_id, quiz_id=quiz.id).one().answers == {'answers_1': '2'}
@@ -0,0 +1,76 @@
+import threading
+from sqlalchemy import event
+import catalog
+from catalog import bump_catalog_version, get_catalog, get_quiz_questions, load_catalog
+from question_sets import graded_paper
+
+
+def count_statements(db, fn):
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        fn()
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    return len(statements)
+
+
+def test_load_catalog_runs_a_fixed_number_of_queries(db, make_quiz):
+    counts = {}
+    total = 0
+    for size in (1, 10, 100):
+        while total < size:
+            make_quiz(n_questions=2)
+            total += 1
+        db.session.expire_all()
+        counts[size] = (count_statements(db, load_catalog), count_statements(db, lambda: load_catalog(True)))
+    assert counts[1] == counts[10] == counts[100], counts
+
+
+def test_concurrent_requests_after_a_change_build_the_snapshot_once(app, db, make_quiz, monkeypatch):
+    make_quiz()
+    bump_catalog_version()
+    db.session.commit()
+    load = catalog.load_catalog
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_load(with_questions=False):
+        loads.append(with_questions)
+        started.set()
+        release.wait(10)
+        return load(with_questions)
+
+    monkeypatch.setattr(catalog, 'load_catalog', slow_load)
+    snapshots = []
+
+    def request():
+        with app.app_context():
+            snapshots.append(get_catalog())
+
+    threads = [threading.Thread(target=request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    assert started.wait(10)
+    release.set()
+    for thread in threads:
+        thread.join(10)
+
+    assert len(snapshots) == 4 and len({id(snapshot) for snapshot in snapshots}) == 1
+    assert loads == [False]
+
+
+def test_grading_loads_only_the_quiz_being_graded_once_per_version(db, make_quiz, make_user):
+    quiz_id = make_quiz(n_questions=4).id
+    make_quiz(n_questions=50)
+    user_id = make_user()
+    catalog = get_catalog()
+    quiz = catalog.quizzes[quiz_id]
+    papers = []
+
+    grade = lambda: papers.extend(graded_paper(catalog, quiz, user_id) for _ in range(3))
+    assert count_statements(db, grade) == 1  # One WHERE quiz_id = ? query, then served from memory
+    paper, answer_key = papers[-1]
+    assert len(paper.questions) == 4 and answer_key == tuple((q.id, '1') for q in paper.questions)
+    assert get_quiz_questions(catalog, quiz) == papers[0]
@@ -0,0 +1,64 @@
+from catalog import bump_catalog_version, get_catalog, get_quiz_questions
+from grading import grade_submission
+from leaderboards import get_leaderboard
+from models import Answer, AttemptBucket, Quiz, Scores, SubjectScoreStats
+from question_sets import draw_paper, graded_paper
+from submission_queue import accept_submission
+
+
+def test_resubmitting_a_quiz_replaces_its_score_everywhere(db, make_quiz, make_user):
+    quiz_id, user_id = make_quiz(n_questions=3).id, make_user()
+    catalog = get_catalog()
+    quiz = catalog.quizzes[quiz_id]
+    subject_id = catalog.chapters[quiz.chapter_id].subject_id
+    paper, answer_key = graded_paper(catalog, quiz, user_id)
+    first, second, third = (question_id for question_id, _ in answer_key)
+    get_leaderboard('quiz', quiz_id)  # Loaded before grading, so the commits update them in place
+    get_leaderboard('subject', subject_id)
+
+    assert grade_submission(paper, subject_id, user_id, answer_key,
+                            {f"answers_{first}": '1', f"answers_{second}": '2'}).score == 1
+    result = grade_submission(paper, subject_id, user_id, answer_key,
+                              {f"answers_{question_id}": '1' for question_id, _ in answer_key})
+    assert result == (3, ['1', '1', '1'])
+
+    answers = Answer.query.filter_by(user_id=user_id).order_by(Answer.id).all()
+    assert [(a.question_id, a.selected_answer, a.is_correct) for a in answers] == [
+        (first, '1', True), (second, '2', False), (third, '', False),
+        (first, '1', True), (second, '1', True), (third, '1', True),
+    ]
+    assert [s.total_scored for s in Scores.query.filter_by(quiz_id=quiz_id, user_id=user_id)] == [3]
+
+    stats = db.session.get(SubjectScoreStats, subject_id)
+    assert (stats.attempts, stats.total_scored_sum, stats.max_score) == (1, 3, 3)
+    assert {score: n for score, n in stats.histogram.items() if n} == {'3': 1}
+    buckets = AttemptBucket.query.filter_by(user_id=user_id).all()
+    assert sorted(b.period for b in buckets) == ['month', 'week']
+    assert all((b.attempts, b.total_scored_sum) == (2, 4) for b in buckets)
+
+    for kind, board_id in (('quiz', quiz_id), ('subject', subject_id)):
+        board = get_leaderboard(kind, board_id)
+        assert len(board) == 1 and board.standing(3).rank == 1
+
+
+def test_a_randomized_paper_is_graded_against_the_students_own_draw(db, make_quiz, make_user):
+    quiz_id, user_id = make_quiz(n_questions=8).id, make_user()
+    row = db.session.get(Quiz, quiz_id)
+    row.question_pool, row.no_of_question = 'quiz', 3
+    bump_catalog_version()
+    db.session.commit()
+    catalog = get_catalog()
+    quiz = catalog.quizzes[quiz_id]
+    drawn = [question.id for question in draw_paper(catalog, quiz, user_id)[0].questions]
+    pool = [question.id for question in get_quiz_questions(catalog, quiz).quiz.questions]
+    assert len(drawn) == 3 and set(drawn) < set(pool)
+
+    # Right answers to every question in the pool; only the three on the student's paper count
+    accepted = accept_submission(catalog, quiz, user_id, {f"answers_{question_id}": '1' for question_id in pool})
+    assert [question.id for question in accepted.quiz.questions] == drawn
+    assert accepted.result.score == 3
+    assert sorted(a.question_id for a in Answer.query.filter_by(user_id=user_id)) == sorted(drawn)
+
+    others = [question_id for question_id in pool if question_id not in drawn]
+    accepted = accept_submission(catalog, quiz, user_id, {f"answers_{question_id}": '1' for question_id in others})
+    assert accepted.result.score == 0
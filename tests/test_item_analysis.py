@@ -0,0 +1,52 @@
+import pytest
+import item_analysis
+from item_analysis import analyze_quizzes, load_answer_columns
+from models import Answer, Scores
+
+
+@pytest.fixture
+def answered_quiz(db, make_quiz, make_user):
+    """A two-question quiz (key '1') answered by four students: the stronger ones get question 1 right"""
+    quiz = make_quiz(n_questions=2)
+    first, second = [question.id for question in quiz.questions]
+    picks = [('1', '1'), ('1', '2'), ('2', '1'), ('3', '')]
+    for chosen in picks:
+        user_id = make_user()
+        for question_id, option in zip((first, second), chosen):
+            db.session.add(Answer(question_id, user_id, option, option, is_correct=option == '1'))
+        db.session.add(Scores(quiz_id=quiz.id, user_id=user_id,
+                              total_scored=sum(option == '1' for option in chosen)))
+    db.session.commit()
+    return quiz.id, first, second
+
+
+def test_item_statistics(db, answered_quiz):
+    quiz_id, first, second = answered_quiz
+    items = {item.question_id: item for item in analyze_quizzes([quiz_id])[quiz_id]}
+    assert items[first].responses == 4 and items[first].difficulty == 0.5
+    assert items[first].options == (0.5, 0.25, 0.25, 0.0)
+    assert items[first].discrimination > 0
+    assert items[second].blank == 0.25
+    assert items[first].distractors == {2: True, 3: True, 4: False}
+
+
+def test_a_table_scan_reads_the_same_columns_as_index_lookups(db, answered_quiz, make_quiz, monkeypatch):
+    quiz_id, first, second = answered_quiz
+    make_quiz()  # Answers and scores of other quizzes are left out either way
+    monkeypatch.setattr(item_analysis, 'ANALYSIS_CHUNK_ROWS', 3)  # Several fetchmany chunks
+    quiz_of = {first: quiz_id, second: quiz_id}
+    looked_up, scanned = load_answer_columns([quiz_id], quiz_of), load_answer_columns([quiz_id], quiz_of, scan=True)
+    assert len(looked_up[0]) == 8
+    rows = lambda columns: sorted(zip(*(column.tolist() for column in columns)))  # Either may come in any order
+    assert rows(looked_up) == rows(scanned)
+    assert sorted(looked_up[3].tolist()) == [0, 0, 1, 1, 1, 1, 2, 2]
+
+
+def test_quiz_manager_computes_missing_statistics_in_the_background(app, db, answered_quiz):
+    quiz_id, first, _ = answered_quiz
+    with app.test_request_context():
+        assert quiz_id not in item_analysis.item_analysis([quiz_id])  # Pending, not computed in the request
+        computing = item_analysis._computing.get(quiz_id)
+        if computing is not None:
+            computing.result(10)
+        assert first in {item.question_id for item in item_analysis.item_analysis([quiz_id])[quiz_id]}
@@ -0,0 +1,80 @@
+import threading
+from sqlalchemy import event
+import leaderboards
+from leaderboards import get_leaderboard, get_leaderboards, record_leaderboard_change
+from models import Scores
+
+
+def add_scores(db, quiz, scores, make_user):
+    users = []
+    for score in scores:
+        user_id = make_user()
+        db.session.add(Scores(quiz_id=quiz.id, user_id=user_id, total_scored=score))
+        users.append(user_id)
+    db.session.commit()
+    return users
+
+
+def test_concurrent_requests_load_a_board_once(app, db, make_quiz, make_user, monkeypatch):
+    quiz = make_quiz()
+    add_scores(db, quiz, [3, 1], make_user)
+    load = leaderboards._load
+    started, release = threading.Event(), threading.Event()
+    loads = []
+
+    def slow_load(kind, board_ids):
+        loads.append(board_ids)
+        started.set()
+        release.wait(10)
+        return load(kind, board_ids)
+
+    monkeypatch.setattr(leaderboards, '_load', slow_load)
+    sizes = []
+
+    def read():
+        with app.app_context():
+            sizes.append(len(get_leaderboard('quiz', quiz.id)))
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    readers[0].start()
+    assert started.wait(10)
+    for reader in readers[1:]:
+        reader.start()
+    release.set()
+    for reader in readers:
+        reader.join(10)
+    assert loads == [[quiz.id]] and sizes == [2] * 4
+
+
+def test_a_change_committed_during_a_reload_is_kept(db, make_quiz, make_user, monkeypatch):
+    quiz = make_quiz()
+    user_id, = add_scores(db, quiz, [2], make_user)
+    load = leaderboards._load
+
+    def load_then_commit(kind, board_ids):
+        boards = load(kind, board_ids)  # Read before the new score was committed
+        db.session.execute(db.update(Scores).filter_by(quiz_id=quiz.id, user_id=user_id).values(total_scored=5))
+        record_leaderboard_change('quiz', quiz.id, user_id, 2, 5)
+        db.session.commit()
+        return boards
+
+    monkeypatch.setattr(leaderboards, '_load', load_then_commit)
+    assert get_leaderboard('quiz', quiz.id).top(1) == [(1, user_id, 5)]
+    monkeypatch.setattr(leaderboards, '_load', load)
+    assert get_leaderboard('quiz', quiz.id).top(1) == [(1, user_id, 5)]  # The stored board, not a new load
+
+
+def test_boards_for_a_page_of_scores_load_in_one_query(db, make_quiz, make_user):
+    quizzes = [make_quiz() for _ in range(3)]
+    for quiz in quizzes:
+        add_scores(db, quiz, [1, 2], make_user)
+    quiz_ids = [quiz.id for quiz in quizzes]
+    statements = []
+    listener = lambda *args: statements.append(args[2])
+    event.listen(db.engine, 'before_cursor_execute', listener)
+    try:
+        boards = get_leaderboards('quiz', quiz_ids)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', listener)
+    assert len(statements) == 1
+    assert [len(boards[quiz_id]) for quiz_id in quiz_ids] == [2, 2, 2]
@@ -0,0 +1,64 @@
+import os
+import subprocess
+import sys
+from passwords import LoginLimiter
+
+
+def test_failures_from_one_address_do_not_lock_the_account_elsewhere(db):
+    limiter = LoginLimiter(window=300, max_failures=5, max_failures_per_ip=50)
+    attacker, student = limiter.keys('Alice', '203.0.113.1'), limiter.keys('alice', '198.51.100.1')
+    for _ in range(5):
+        limiter.record_failure(attacker)
+    assert limiter.is_blocked(attacker)
+    assert not limiter.is_blocked(student)
+
+
+def test_an_address_is_limited_across_usernames(db):
+    limiter = LoginLimiter(window=300, max_failures=5, max_failures_per_ip=3)
+    for name in ('a', 'b', 'c'):
+        limiter.record_failure(limiter.keys(name, '203.0.113.2'))
+    assert limiter.is_blocked(limiter.keys('d', '203.0.113.2'))
+    assert not limiter.is_blocked(limiter.keys('d', '198.51.100.2'))
+
+
+# A server process behind one trusted proxy, where every peer address is the proxy's
+_BEHIND_PROXY = """
+import sys
+sys.path.insert(0, {root!r})
+from app import app
+client = app.test_client()
+
+def login(address):
+    return client.post('/user_login', data={{'username': 'nobody', 'password': 'wrong'}},
+                       headers={{'X-Forwarded-For': address}}, environ_base={{'REMOTE_ADDR': '10.0.0.1'}}).status_code
+
+statuses = [login('203.0.113.9') for _ in range(6)]
+assert statuses[-1] == 429, statuses
+assert login('198.51.100.7') != 429
+"""
+
+
+def test_behind_a_trusted_proxy_clients_are_told_apart_by_forwarded_address(app):
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, TRUSTED_PROXIES='1')
+    assert subprocess.run([sys.executable, '-c', _BEHIND_PROXY.format(root=root)], env=env).returncode == 0
+
+
+# Another worker process recording failed logins against the same database
+_OTHER_WORKER = """
+import sys
+sys.path.insert(0, {root!r})
+from app import app, db, login_limiter
+with app.app_context():
+    for _ in range(5):
+        login_limiter.record_failure(login_limiter.keys('bob', '192.0.2.5'))
+    db.session.commit()
+"""
+
+
+def test_failures_are_shared_between_worker_processes(app, db):
+    from app import login_limiter
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    assert subprocess.run([sys.executable, '-c', _OTHER_WORKER.format(root=root)], env=os.environ).returncode == 0
+    assert login_limiter.is_blocked(login_limiter.keys('bob', '192.0.2.5'))
+    assert not login_limiter.is_blocked(login_limiter.keys('bob', '192.0.2.6'))
@@ -0,0 +1,101 @@
+import pytest
+from sqlalchemy import create_engine, inspect
+from migrations import upgrade_schema
+from models import db
+from search_index import SEARCH_SOURCES
+
+# The schema as created by the first release, before any ON DELETE action or index
+BASELINE_SCHEMA = """
+CREATE TABLE users (
+    id INTEGER PRIMARY KEY, username VARCHAR(80) NOT NULL UNIQUE, email VARCHAR(80) NOT NULL UNIQUE,
+    password VARCHAR(200) NOT NULL, full_name VARCHAR(200) NOT NULL, qualification VARCHAR(200) NOT NULL,
+    role INTEGER, blocked BOOLEAN
+);
+CREATE TABLE subjects (id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, description TEXT NOT NULL);
+CREATE TABLE chapters (
+    id INTEGER PRIMARY KEY, name VARCHAR(100) NOT NULL, no_of_question INTEGER NOT NULL, description TEXT NOT NULL,
+    subject_id INTEGER NOT NULL REFERENCES subjects (id)
+);
+CREATE TABLE quizzes (
+    id INTEGER PRIMARY KEY, quiz_name VARCHAR(40) NOT NULL, chapter_id INTEGER NOT NULL REFERENCES chapters (id),
+    no_of_question INTEGER NOT NULL, remarks TEXT
+);
+CREATE TABLE questions (
+    id INTEGER PRIMARY KEY, subject_id INTEGER NOT NULL REFERENCES subjects (id),
+    chapter_id INTEGER NOT NULL REFERENCES chapters (id), quiz_id INTEGER NOT NULL REFERENCES quizzes (id),
+    question_title TEXT NOT NULL, question_statement TEXT NOT NULL, option1 VARCHAR(255) NOT NULL,
+    option2 VARCHAR(255) NOT NULL, option3 VARCHAR(255) NOT NULL, option4 VARCHAR(255) NOT NULL,
+    correct_option VARCHAR(10) NOT NULL
+);
+CREATE TABLE scores (
+    id INTEGER PRIMARY KEY, quiz_id INTEGER NOT NULL REFERENCES quizzes (id),
+    user_id INTEGER NOT NULL REFERENCES users (id), total_scored INTEGER NOT NULL
+);
+CREATE TABLE answers (
+    id INTEGER PRIMARY KEY, question_id INTEGER NOT NULL REFERENCES questions (id),
+    user_id INTEGER NOT NULL REFERENCES users (id), answer_text TEXT NOT NULL, selected_answer TEXT NOT NULL,
+    is_correct BOOLEAN
+);
+"""
+
+BASELINE_ROWS = """
+INSERT INTO users VALUES (1, 'asha', 'asha@example.com', 'x', 'Asha', 'BSc', 1, 0);
+INSERT INTO subjects VALUES (1, 'Physics', 'Mechanics and waves'), (2, 'Biology', 'Cells');
+INSERT INTO chapters VALUES (1, 'Motion', 2, 'Kinematics', 1), (2, 'Cells', 1, 'Cell biology', 2);
+INSERT INTO quizzes VALUES (1, 'Motion basics', 1, 2, NULL), (2, 'Cell basics', 2, 1, NULL);
+INSERT INTO questions VALUES
+    (1, 1, 1, 1, 'Velocity', 'Speed with a direction?', 'a', 'b', 'c', 'd', '1'),
+    (2, 1, 1, 1, 'Acceleration', 'Change of velocity?', 'a', 'b', 'c', 'd', '2'),
+    (3, 2, 2, 2, 'Nucleus', 'Holds the DNA?', 'a', 'b', 'c', 'd', '1');
+INSERT INTO scores VALUES (1, 1, 1, 1), (2, 1, 1, 2), (3, 2, 1, 1);
+INSERT INTO answers VALUES
+    (1, 1, 1, 'a', '1', 1), (2, 2, 1, 'b', '2', 1), (3, 3, 1, 'a', '1', 1),
+    (4, 99, 1, 'a', '1', 1), (5, 98, 1, 'b', '2', 0);
+"""  # Answers 4 and 5 belong to questions deleted back when nothing cascaded
+
+
+@pytest.fixture
+def baseline_engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'baseline.sqlite'}")
+    raw = engine.raw_connection()
+    try:
+        raw.executescript(BASELINE_SCHEMA + BASELINE_ROWS)
+        raw.commit()
+    finally:
+        raw.close()
+    yield engine
+    engine.dispose()
+
+
+def count(conn, table):
+    return conn.exec_driver_sql(f"SELECT COUNT(*) FROM {table}").scalar()
+
+
+def test_upgrading_a_baseline_database(baseline_engine):
+    db.metadata.create_all(baseline_engine)  # As init_database does before upgrading
+    upgrade_schema(baseline_engine)
+
+    with baseline_engine.connect() as conn:
+        assert {table: count(conn, table) for table in ('users', 'subjects', 'chapters', 'quizzes', 'questions')} \
+            == {'users': 1, 'subjects': 2, 'chapters': 2, 'quizzes': 2, 'questions': 3}
+        assert conn.exec_driver_sql("SELECT id FROM answers ORDER BY id").scalars().all() == [1, 2, 3]
+        assert conn.exec_driver_sql("SELECT id FROM scores ORDER BY id").scalars().all() == [2, 3]  # Latest kept
+        assert conn.exec_driver_sql("PRAGMA foreign_key_check").all() == []
+
+        indexes = {ix['name'] for table in db.metadata.sorted_tables for ix in inspect(conn).get_indexes(table.name)}
+        assert {index.name for table in db.metadata.sorted_tables for index in table.indexes} <= indexes
+        triggers = set(conn.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'trigger'").scalars())
+        assert {f"{table}_fts_{event}" for table in SEARCH_SOURCES for event in ('ai', 'ad', 'au')} <= triggers
+        assert conn.exec_driver_sql(
+            "SELECT rowid FROM questions_fts WHERE questions_fts MATCH 'acceleration'"
+        ).scalars().all() == [2]
+
+    with baseline_engine.connect() as conn:
+        conn.exec_driver_sql("PRAGMA foreign_keys=ON")  # Before any transaction, or SQLite ignores it
+        conn.exec_driver_sql("DELETE FROM subjects WHERE id = 1")
+        assert (count(conn, 'chapters'), count(conn, 'quizzes'), count(conn, 'questions'), count(conn, 'answers'),
+                count(conn, 'scores')) == (1, 1, 1, 1, 1)
+        assert conn.exec_driver_sql(
+            "SELECT rowid FROM questions_fts WHERE questions_fts MATCH 'acceleration'"
+        ).scalars().all() == []
+        conn.rollback()
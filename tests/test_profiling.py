@@ -0,0 +1,34 @@
+import threading
+import time
+from flask import g
+import profiling
+
+
+def test_only_one_request_at_a_time_is_cprofiled(app, tmp_path, monkeypatch):
+    monkeypatch.setitem(app.config, 'SLOW_REQUEST_MS', 1)
+    monkeypatch.setitem(app.config, 'PROFILE_DIR', str(tmp_path))
+    first_started, first_release = threading.Event(), threading.Event()
+    profiled = {}
+
+    def request(name, hold=False):
+        with app.test_request_context('/first_page'):
+            profiling._start_request(app)
+            profiled[name] = g.profile.profiler is not None
+            if hold:
+                first_started.set()
+                first_release.wait(10)
+                time.sleep(0.05)  # Well past SLOW_REQUEST_MS, so its profile is dumped
+            profiling._finish_request(app)
+
+    first = threading.Thread(target=request, args=('first', True))
+    first.start()
+    assert first_started.wait(10)
+    second = threading.Thread(target=request, args=('second',))
+    second.start()
+    second.join(10)
+    first_release.set()
+    first.join(10)
+    request('third')
+
+    assert profiled == {'first': True, 'second': False, 'third': True}
+    assert list(tmp_path.glob('*.prof'))  # The held request was slow enough to be dumped
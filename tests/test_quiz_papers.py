@@ -0,0 +1,40 @@
+import threading
+import quiz_papers
+from quiz_papers import get_quiz_paper
+
+
+def test_a_slow_render_does_not_hold_up_other_papers(app, db, make_quiz, monkeypatch):
+    slow_quiz, fast_quiz = make_quiz().id, make_quiz().id
+    render = quiz_papers._render
+    slow_started, slow_release = threading.Event(), threading.Event()
+    renders = []
+
+    def tracked_render(quiz, option_orders=None):
+        renders.append(quiz.id)
+        if quiz.id == slow_quiz:
+            slow_started.set()
+            slow_release.wait(10)
+        return render(quiz, option_orders)
+
+    monkeypatch.setattr(quiz_papers, '_render', tracked_render)
+
+    def open_paper(quiz_id, papers):
+        with app.test_request_context():
+            papers.append(get_quiz_paper(quiz_id))
+
+    slow_papers, fast_papers = [], []
+    slow = [threading.Thread(target=open_paper, args=(slow_quiz, slow_papers)) for _ in range(3)]
+    for thread in slow:
+        thread.start()
+    assert slow_started.wait(10)
+    fast = threading.Thread(target=open_paper, args=(fast_quiz, fast_papers))
+    fast.start()
+    fast.join(5)
+    finished_while_slow_rendered = not fast.is_alive()
+    slow_release.set()
+    for thread in slow + [fast]:
+        thread.join(10)
+
+    assert finished_while_slow_rendered
+    assert len(slow_papers) == 3 and len({paper.etag for paper in slow_papers}) == 1
+    assert renders.count(slow_quiz) == 1  # The students opening the slow paper waited for one render
@@ -0,0 +1,17 @@
+import search_index
+from search_index import search_catalog
+
+
+def test_catalog_search_without_a_full_text_index(app, db, make_quiz, monkeypatch):
+    quiz = make_quiz()
+    quiz.remarks = 'photosynthesis in leaves'
+    db.session.commit()
+    monkeypatch.setattr(search_index, 'search_enabled', lambda: False)  # As on a database other than SQLite
+    page = search_catalog('photosynth leaves', kinds=['quizzes'])
+    assert [(hit.kind, hit.id) for hit in page.hits] == [('quizzes', quiz.id)]
+    assert not search_catalog('photosynthesis chlorophyll').hits
+
+    client = app.test_client()
+    client.post('/admin_login', data={'username': 'admin', 'password': 'admin123'})
+    response = client.get('/search_catalog', query_string={'q': 'photosynthesis'})
+    assert response.status_code == 200 and response.json['results'][0]['id'] == quiz.id
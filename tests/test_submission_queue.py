@@ -0,0 +1,82 @@
+import os
+import subprocess
+import sys
+import textwrap
+from models import Answer, Attempt, PendingSubmission
+from submission_queue import SUBMISSION_MAX_ATTEMPTS, drain_submissions, submission_state
+
+# Grades submissions in a separate process and kills it without cleanup after the third one
+_CRASHING_WRITER = textwrap.dedent("""
+    import os, sys
+    sys.path.insert(0, {root!r})
+    import submission_queue
+    from app import app
+
+    graded = []
+    apply_submission = submission_queue.apply_submission
+
+    def apply_then_crash(*args, **kwargs):
+        result = apply_submission(*args, **kwargs)
+        graded.append(1)
+        if len(graded) == 3:
+            os._exit(17)
+        return result
+
+    submission_queue.apply_submission = apply_then_crash
+    with app.app_context():
+        submission_queue.drain_submissions()
+""")
+
+
+def queue(db, quiz, user_id, answers):
+    submission = PendingSubmission(user_id=user_id, quiz_id=quiz.id, answers=answers)
+    db.session.add(submission)
+    db.session.commit()
+    return submission.id
+
+
+def graded_once(db, quiz, user_id):
+    attempts = db.session.query(Attempt).filter_by(quiz_id=quiz.id, user_id=user_id).count()
+    answers = db.session.query(Answer).filter_by(user_id=user_id).count()
+    return attempts == 1 and answers == quiz.no_of_question
+
+
+def test_a_writer_killed_mid_batch_loses_and_repeats_nothing(db, make_quiz, make_user):
+    quiz = make_quiz(n_questions=3)
+    students = [make_user() for _ in range(6)]
+    question_ids = [question.id for question in quiz.questions]
+    for user_id in students:
+        queue(db, quiz, user_id, {f"answers_{question_id}": '1' for question_id in question_ids})
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    writer = subprocess.run([sys.executable, '-c', _CRASHING_WRITER.format(root=root)], env=os.environ)
+    assert writer.returncode == 17
+
+    db.session.expire_all()
+    assert db.session.query(PendingSubmission).count() == len(students)  # The whole batch is still queued
+    assert db.session.query(Attempt).filter_by(quiz_id=quiz.id).count() == 0
+
+    while drain_submissions():
+        pass
+    assert db.session.query(PendingSubmission).count() == 0
+    assert all(graded_once(db, quiz, user_id) for user_id in students)
+
+
+def test_a_submission_that_cannot_be_graded_does_not_block_the_queue(db, make_quiz, make_user):
+    quiz = make_quiz(n_questions=2)
+    question_ids = [question.id for question in quiz.questions]
+    before, poisoned_user, after = make_user(), make_user(), make_user()
+    queue(db, quiz, before, {f"answers_{question_ids[0]}": '1'})
+    poisoned = queue(db, quiz, poisoned_user, ['not', 'a', 'form'])
+    queue(db, quiz, after, {f"answers_{question_ids[1]}": '1'})
+
+    drains = 0
+    while drain_submissions():
+        drains += 1
+    assert drains == SUBMISSION_MAX_ATTEMPTS  # Retried, then set aside instead of retried forever
+
+    assert graded_once(db, quiz, before) and graded_once(db, quiz, after)
+    assert db.session.query(Attempt).filter_by(user_id=poisoned_user).count() == 0
+    row = db.session.get(PendingSubmission, poisoned)
+    assert row.attempts == SUBMISSION_MAX_ATTEMPTS and row.failed_at is not None and row.error
+    assert submission_state(poisoned, poisoned_user) == 'failed'
@@ -0,0 +1,49 @@
+from models import User
+from user_cache import UserCache
+
+
+def test_registration_does_not_flush_the_cache(app, db, make_user):
+    from app import user_cache
+    user_id = make_user()
+    user_cache.get(user_id)
+    client = app.test_client()
+    client.post('/register', data={'username': 'newcomer', 'email': 'newcomer@example.com', 'password': 'pw',
+                                   'full_name': 'new', 'qualification': 'none'})
+    hits = user_cache.stats()['hits']
+    user_cache.get(user_id)
+    assert user_cache.stats()['hits'] == hits + 1
+
+
+def test_block_during_a_load_is_not_cached_stale(db, make_user, tmp_path, monkeypatch):
+    user_id = make_user()
+    cache = UserCache(stamp_path=str(tmp_path / 'stamp'))
+    execute = db.session.execute
+
+    def block_after_read(*args, **kwargs):
+        result = execute(*args, **kwargs)
+        rows = result.all()  # Read the row as it was, then let the admin block the user
+        db.session.get(User, user_id).blocked = True
+        db.session.commit()
+        cache.invalidate(user_id)
+        monkeypatch.setattr(db.session, 'execute', execute)
+        return _Rows(rows)
+
+    monkeypatch.setattr(db.session, 'execute', block_after_read)
+    assert cache.get(user_id).is_active  # The load itself saw the old row
+    assert not cache.get(user_id).is_active
+
+    cache.invalidate(user_id)  # The same without a stamp file shared between processes
+    db.session.get(User, user_id).blocked = False
+    db.session.commit()
+    cache.stamp_path = None
+    monkeypatch.setattr(db.session, 'execute', block_after_read)
+    assert cache.get(user_id).is_active
+    assert not cache.get(user_id).is_active
+
+
+class _Rows:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def first(self):
+        return self.rows[0] if self.rows else None
@@ -0,0 +1,102 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from flask_login import UserMixin
+from models import db, User
+
+USER_CACHE_SIZE = 10000  # User records kept per process
+USER_CACHE_TTL = 300  # Seconds before a cached record is reloaded
+
+
+class CachedUser(UserMixin):
+    """The few User columns a request needs, detached from any session"""
+
+    def __init__(self, id, username, role, blocked):
+        self.id = id
+        self.username = username
+        self.role = role
+        self.blocked = bool(blocked)
+
+    @property
+    def is_active(self):
+        return not self.blocked  # Users are active unless blocked
+
+    def get_id(self):
+        return str(self.id)
+
+
+class UserCache:
+    """Bounded LRU + TTL cache for the Flask-Login user_loader.
+
+    invalidate() drops the entry in this process and touches stamp_path; every
+    process clears its cache when it sees the stamp change, so a block takes
+    effect at once in all workers sharing the instance folder. A record loaded
+    while an invalidation happened is returned but not cached, since it may
+    predate the change.
+    """
+
+    def __init__(self, maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL, stamp_path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.stamp_path = stamp_path
+        self.hits = self.misses = self.evictions = 0
+        self._entries = OrderedDict()  # id -> (CachedUser, expires_at)
+        self._stamp = self._read_stamp()
+        self._generation = 0  # Bumped by every invalidate() in this process
+        self._lock = threading.Lock()
+
+    def get(self, user_id):
+        """Return the cached record for user_id, loading it from the database on a miss"""
+        now = time.monotonic()
+        stamp = self._read_stamp()
+        with self._lock:
+            if stamp != self._stamp:
+                self._entries.clear()
+                self._stamp = stamp
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            generation = self._generation
+
+        row = db.session.execute(
+            db.select(User.id, User.username, User.role, User.blocked).filter_by(id=user_id)
+        ).first()
+        if row is None:
+            return None
+        user = CachedUser(*row)
+        if self._read_stamp() != stamp:
+            return user
+        with self._lock:
+            if self._generation != generation:
+                return user
+            self._entries[user_id] = (user, now + self.ttl)
+            self._entries.move_to_end(user_id)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return user
+
+    def invalidate(self, user_id):
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generation += 1
+        if self.stamp_path:
+            with open(self.stamp_path, 'a'):
+                os.utime(self.stamp_path)
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'evictions': self.evictions}
+
+    def _read_stamp(self):
+        if not self.stamp_path:
+            return None
+        try:
+            return os.stat(self.stamp_path).st_mtime_ns
+        except FileNotFoundError:
+            return None
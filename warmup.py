@@ -0,0 +1,26 @@
+import logging
+import time
+from sqlalchemy import text
+from models import db
+from catalog import get_catalog
+from leaderboards import rebuild_leaderboards
+
+log = logging.getLogger(__name__)
+
+
+def warm_up(app):
+    """Fill this process's caches before it serves traffic, so its first requests don't pay for them.
+
+    Opens a pooled database connection, loads the catalog snapshot and every leaderboard,
+    and compiles every template into the Jinja environment's cache.
+    """
+    started = time.perf_counter()
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+        get_catalog()
+        rebuild_leaderboards()
+        db.session.remove()
+    templates = app.jinja_env.list_templates()
+    for name in templates:
+        app.jinja_env.get_template(name)
+    log.info("Warmed up in %.2fs (%d templates)", time.perf_counter() - started, len(templates))
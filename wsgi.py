@@ -0,0 +1,7 @@
+"""Production entry point: gunicorn wsgi:app (settings in gunicorn.conf.py)
+
+Run `flask --app app init-db` once per deploy first; workers don't create or migrate the schema.
+"""
+from app import create_app
+
+app = create_app()